@@ -7,7 +7,7 @@ import re
 import jieba
 import jieba.posseg as pseg
 from typing import List, Dict, Any, Optional, Tuple
-from collections import Counter
+from collections import Counter, OrderedDict
 import dashscope
 from dashscope import Generation
 import asyncio
@@ -35,13 +35,43 @@ class AIService:
         
         # 停用词集合（使用统一配置）
         self.stop_words = text_config.BASE_STOP_WORDS
+        
+        # 大模型输出LRU缓存：(prompt, max_tokens, temperature) -> 生成文本，相同转写重复处理时跳过API调用
+        self._generation_cache: "OrderedDict[Tuple[str, int, float], str]" = OrderedDict()
+        self._generation_cache_size = 128
     
-    async def generate_summary(self, text: str, summary_type: str = "meeting") -> Dict[str, Any]:
+    async def _generate_text(self, prompt: str, max_tokens: int, temperature: float, use_cache: bool = True) -> Optional[str]:
+        """调用通义模型生成文本（命中缓存时直接返回，use_cache为False时总是重新生成并刷新缓存），失败返回None，失败结果不缓存"""
+        key = (prompt, max_tokens, temperature)
+        cached = self._generation_cache.get(key) if use_cache else None
+        if cached is not None:
+            self._generation_cache.move_to_end(key)
+            return cached
+        
+        response = await asyncio.to_thread(
+            Generation.call,
+            model='qwen-turbo',
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        if response.status_code != 200:
+            logger.error(f"模型调用失败: {response.message}")
+            return None
+        
+        output_text = response.output.text.strip()
+        self._generation_cache[key] = output_text
+        if len(self._generation_cache) > self._generation_cache_size:
+            self._generation_cache.popitem(last=False)
+        return output_text
+    
+    async def generate_summary(self, text: str, summary_type: str = "meeting", use_cache: bool = True) -> Dict[str, Any]:
         """生成智能摘要
         
         Args:
             text: 原始文本
             summary_type: 摘要类型 (meeting, interview, lecture等)
+            use_cache: 是否复用相同输入的已生成摘要（重新生成摘要时为False）
             
         Returns:
             包含摘要内容和质量评分的字典
@@ -94,16 +124,9 @@ class AIService:
             
             prompt = prompts.get(summary_type, prompts["meeting"]).format(text=text[:4000])  # 限制输入长度
             
-            response = await asyncio.to_thread(
-                Generation.call,
-                model='qwen-turbo',
-                prompt=prompt,
-                max_tokens=500,
-                temperature=0.3
-            )
+            summary_content = await self._generate_text(prompt, max_tokens=500, temperature=0.3, use_cache=use_cache)
             
-            if response.status_code == 200:
-                summary_content = response.output.text.strip()
+            if summary_content is not None:
                 
                 # 评估摘要质量
                 quality_score = self._evaluate_summary_quality(text, summary_content)
@@ -120,7 +143,7 @@ class AIService:
                     "compression_ratio": round(len(summary_content) / len(text), 2)
                 }
             else:
-                logger.error(f"摘要生成失败: {response.message}")
+                logger.error("摘要生成失败")
                 return self._fallback_summary(text)
                 
         except Exception as e:
@@ -144,8 +167,11 @@ class AIService:
             # 使用统一的扩展停用词配置
             extended_stop_words = text_config.get_all_stop_words()
             
-            # 使用jieba进行分词和词性标注
-            words = pseg.cut(text)
+            # 使用jieba进行分词和词性标注（CPU密集，放到线程中执行），同时并发调用AI模型提取更精准的关键词
+            words, ai_keywords = await asyncio.gather(
+                asyncio.to_thread(lambda: list(pseg.cut(text))),
+                self._ai_extract_keywords(text)
+            )
             
             # 更严格的词汇过滤，只保留核心名词和动词
             meaningful_words = []
@@ -160,9 +186,6 @@ class AIService:
             # 统计词频
             word_freq = Counter(meaningful_words)
             
-            # 使用AI模型提取更精准的关键词
-            ai_keywords = await self._ai_extract_keywords(text)
-            
             # 合并结果，使用更精准的评分算法
             final_keywords = []
             processed_words = set()
@@ -234,16 +257,10 @@ class AIService:
 
 关键词："""
 
-            response = await asyncio.to_thread(
-                Generation.call,
-                model='qwen-turbo',
-                prompt=prompt,
-                max_tokens=80,
-                temperature=0.0  # 降低随机性，提高一致性
-            )
+            # 降低随机性，提高一致性
+            keywords_text = await self._generate_text(prompt, max_tokens=80, temperature=0.0)
             
-            if response.status_code == 200:
-                keywords_text = response.output.text.strip()
+            if keywords_text is not None:
                 # 清理返回的文本，去除可能的标点符号干扰
                 keywords_text = re.sub(r'[。！？；：\n\r]', '', keywords_text)
                 keywords = [kw.strip() for kw in keywords_text.split(',') if kw.strip()]
@@ -62,6 +62,31 @@ class AudioBuffer:
         
         return np.concatenate(result_data) if result_data else np.array([], dtype=self.dtype)
     
+    def pop_front_into(self, out: np.ndarray) -> int:
+        """从前面弹出数据并写入调用方提供的缓冲区，避免每次分配新数组
+        
+        Returns:
+            int: 实际写入的样本数
+        """
+        length = len(out)
+        written = 0
+        
+        while written < length and self.chunks:
+            chunk = self.chunks[0]
+            take = min(len(chunk), length - written)
+            out[written:written + take] = chunk[:take]
+            
+            if take == len(chunk):
+                # 整个chunk都被弹出
+                self.chunks.popleft()
+            else:
+                # 只弹出chunk的一部分
+                self.chunks[0] = chunk[take:]
+            written += take
+        
+        self._total_length -= written
+        return written
+    
     def __len__(self) -> int:
         """返回缓冲区中的总样本数"""
         return self._total_length
@@ -107,7 +132,7 @@ class CircularAudioBuffer:
     
     def append(self, data: np.ndarray):
         """添加数据到循环缓冲区"""
-        data = data.astype(self.dtype)
+        data = data.astype(self.dtype, copy=False)
         data_len = len(data)
         
         # 如果数据太大，只保留最后的部分
@@ -156,7 +181,7 @@ class CircularAudioBuffer:
         
         # 调整长度以不超过可用数据
         actual_length = min(length, self.size - start_offset)
-        result = np.zeros(actual_length, dtype=self.dtype)
+        result = np.empty(actual_length, dtype=self.dtype)
         
         start_pos = (self.read_pos + start_offset) % self.max_samples
         end_pos = start_pos + actual_length
@@ -171,6 +196,17 @@ class CircularAudioBuffer:
         
         return result
     
+    def discard_front(self, length: int) -> int:
+        """从前面丢弃数据（只移动读指针，不复制）
+        
+        Returns:
+            int: 实际丢弃的样本数
+        """
+        actual_length = min(max(length, 0), self.size)
+        self.read_pos = (self.read_pos + actual_length) % self.max_samples
+        self.size -= actual_length
+        return actual_length
+    
     def pop_front(self, length: int) -> np.ndarray:
         """从前面弹出数据"""
         if length <= 0 or self.size == 0:
@@ -32,13 +32,19 @@ class Config(BaseSettings):
     
     # 换行控制配置
     pause_threshold_ms: int = Field(1500, description="Pause threshold in milliseconds for line break detection")
+    sv_cache_ttl_ms: int = Field(1500, description="Reuse the last speaker verification result for segments starting within this window")
     enable_smart_line_break: bool = Field(True, description="Enable smart line break based on speaker and pause detection")
     
     # 线程池配置
     thread_pool_max_workers: int = Field(4, description="Maximum number of threads in the thread pool")
+    asr_queue_max_size: int = Field(4, description="Maximum number of pending VAD segments per WebSocket session")
+    asr_batch_max_size: int = Field(8, description="Maximum number of ASR requests merged into one model call")
+    asr_batch_timeout_ms: int = Field(10, description="Time to wait for more ASR requests before running a batch")
     
     # 硬件配置
     use_gpu: bool = Field(True, description="Whether to use GPU for model inference")
+    asr_fp16: bool = Field(True, description="Run ASR inference under FP16 autocast when using GPU")
+    sv_compile: bool = Field(False, description="Compile the CAM++ embedding network with torch.compile when using GPU")
     
     # 缓冲区配置
     audio_buffer_max_size: int = Field(100, description="Maximum size of audio buffer")
@@ -145,6 +151,15 @@ class UIConfig:
     # 文件上传限制
     MAX_FILE_SIZE_MB = 200  # 最大文件大小（MB）
     SUPPORTED_AUDIO_FORMATS = ['.wav', '.mp3', '.m4a', '.flac', '.aac']
+    
+    # 文件扩展名到媒体类型的映射（未知扩展名按wav处理）
+    AUDIO_MEDIA_TYPES = {
+        '.wav': 'audio/wav',
+        '.mp3': 'audio/mpeg',
+        '.m4a': 'audio/mp4',
+        '.flac': 'audio/flac',
+        '.aac': 'audio/aac',
+    }
 
 
 class ProcessingConfig:
@@ -153,6 +168,10 @@ class ProcessingConfig:
     # 异步处理配置
     MAX_CONCURRENT_TASKS = 3  # 最大并发任务数
     TASK_TIMEOUT_SECONDS = 3600  # 任务超时时间（秒）
+    ASR_BATCH_CHUNKS = 16  # 录音文件处理时每次批量识别的分段数
+    SPEAKER_EMBEDDING_BATCH = 8  # 每次批量提取声纹嵌入的音频段数
+    SPEAKER_EMBEDDING_CACHE_SIZE = 4096  # 声纹嵌入缓存条目数（按音频内容指纹去重）
+    PROCESSING_WORKERS = 1  # 录音后台处理的工作协程数（共享说话人识别状态，保持为1）
     
     # AI分析配置
     MAX_TEXT_LENGTH_FOR_AI = 50000  # AI分析的最大文本长度
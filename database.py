@@ -4,10 +4,10 @@
 
 import sqlite3
 import os
-import json
+import orjson
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from sqlalchemy import create_engine, Column, Integer, String, Text, Float, DateTime, JSON, ForeignKey
+from sqlalchemy import create_engine, event, inspect, insert, text, Column, Integer, String, Text, Float, DateTime, JSON, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
 from loguru import logger
@@ -15,6 +15,16 @@ from loguru import logger
 Base = declarative_base()
 
 
+def _json_dumps(obj: Any) -> str:
+    """JSON列序列化（orjson，直接输出UTF-8而非\\u转义）"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _json_loads(data: str) -> Any:
+    """JSON列反序列化（orjson）"""
+    return orjson.loads(data)
+
+
 class Recording(Base):
     """录音记录表"""
     __tablename__ = "recordings"
@@ -22,6 +32,7 @@ class Recording(Base):
     id = Column(String, primary_key=True)
     title = Column(String(255), nullable=False)
     file_path = Column(String(500))
+    media_type = Column(String(50))  # 文件媒体类型(入库时确定，下载时直接使用)
     duration = Column(Float)  # 时长(秒)
     speaker_count = Column(Integer)
     language = Column(String(10), default="zh")
@@ -32,6 +43,9 @@ class Recording(Base):
     # 处理选项
     options = Column(JSON)  # 存储处理选项 (智能标点、数字转换等)
     
+    # 全文（段落内容以空格拼接，随段落一起写入，重新生成摘要时直接读取；段落被逐条修改时清空）
+    full_text = Column(Text)
+    
     # 关联关系
     segments = relationship("SpeechSegment", back_populates="recording", cascade="all, delete-orphan")
     summaries = relationship("Summary", back_populates="recording", cascade="all, delete-orphan")
@@ -57,6 +71,27 @@ class SpeechSegment(Base):
     recording = relationship("Recording", back_populates="segments")
 
 
+def _invalidate_full_text(mapper, connection, target):
+    """段落经ORM逐条增删或修改内容时清空录音全文，重新生成摘要时回退到拼接段落
+    
+    _replace_segments使用批量写入，不触发这些事件，并会同步重写全文。
+    """
+    connection.execute(
+        Recording.__table__.update().where(Recording.id == target.recording_id).values(full_text=None)
+    )
+
+
+def _invalidate_full_text_on_content_change(mapper, connection, target):
+    """只有内容变化才影响全文（修改发言人名称等不需要）"""
+    if inspect(target).attrs.content.history.has_changes():
+        _invalidate_full_text(mapper, connection, target)
+
+
+event.listen(SpeechSegment, "after_insert", _invalidate_full_text)
+event.listen(SpeechSegment, "after_delete", _invalidate_full_text)
+event.listen(SpeechSegment, "after_update", _invalidate_full_text_on_content_change)
+
+
 class Summary(Base):
     """智能摘要表"""
     __tablename__ = "summaries"
@@ -126,15 +161,49 @@ class SpeakerSettingsLog(Base):
 class DatabaseManager:
     """数据库管理器"""
     
+    # 后续新增的列（create_all不会修改已存在的表，需要手动补齐）
+    ADDED_COLUMNS = {
+        "recordings": {
+            "media_type": "VARCHAR(50)",
+            "full_text": "TEXT",
+        },
+    }
+    
     def __init__(self, db_path: str = "recordings.db"):
         self.db_path = db_path
-        self.engine = create_engine(f"sqlite:///{db_path}")
+        self.engine = create_engine(
+            f"sqlite:///{db_path}",
+            json_serializer=_json_dumps,
+            json_deserializer=_json_loads,
+        )
+        event.listen(self.engine, "connect", self._set_sqlite_pragmas)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
         
         # 创建表
         Base.metadata.create_all(bind=self.engine)
+        self._add_missing_columns()
         logger.info(f"数据库初始化完成: {db_path}")
     
+    @staticmethod
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """为每个新连接设置SQLite参数（synchronous和temp_store只对当前连接生效，journal_mode=WAL写入数据库文件）"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+    
+    def _add_missing_columns(self):
+        """为旧数据库补齐新增的列"""
+        inspector = inspect(self.engine)
+        with self.engine.begin() as conn:
+            for table_name, columns in self.ADDED_COLUMNS.items():
+                existing = {col["name"] for col in inspector.get_columns(table_name)}
+                for column_name, column_type in columns.items():
+                    if column_name not in existing:
+                        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+                        logger.info(f"数据库表 {table_name} 新增列: {column_name}")
+    
     def get_session(self) -> Session:
         """获取数据库会话"""
         return self.SessionLocal()
@@ -147,6 +216,7 @@ class DatabaseManager:
                     id=recording_data["id"],
                     title=recording_data["title"],
                     file_path=recording_data.get("file_path"),
+                    media_type=recording_data.get("media_type"),
                     duration=recording_data.get("duration", 0),
                     speaker_count=recording_data.get("speaker_count", 0),
                     language=recording_data.get("language", "zh"),
@@ -208,6 +278,7 @@ class DatabaseManager:
                     "id": recording.id,
                     "title": recording.title,
                     "filePath": recording.file_path,
+                    "mediaType": recording.media_type,
                     "duration": recording.duration,
                     "speakerCount": recording.speaker_count,
                     "language": recording.language,
@@ -225,23 +296,7 @@ class DatabaseManager:
         """保存发言段落"""
         try:
             with self.get_session() as session:
-                # 删除已存在的段落
-                session.query(SpeechSegment).filter(SpeechSegment.recording_id == recording_id).delete()
-                
-                # 添加新段落
-                for segment in segments:
-                    speech_segment = SpeechSegment(
-                        recording_id=recording_id,
-                        speaker_id=segment.get("speaker_id"),
-                        speaker_name=segment.get("speaker_name"),
-                        speaker_color=segment.get("speaker_color"),
-                        content=segment.get("content", ""),
-                        start_time=segment.get("start_time", 0),
-                        end_time=segment.get("end_time", 0),
-                        confidence=segment.get("confidence", 0)
-                    )
-                    session.add(speech_segment)
-                
+                self._replace_segments(session, recording_id, segments)
                 session.commit()
                 logger.info(f"保存 {len(segments)} 个发言段落到录音 {recording_id}")
                 return True
@@ -250,6 +305,44 @@ class DatabaseManager:
             logger.error(f"保存发言段落失败: {str(e)}")
             return False
     
+    def _replace_segments(self, session: Session, recording_id: str, segments: List[Dict[str, Any]]):
+        """在给定会话中替换录音的全部段落（一次executemany批量插入，不提交）"""
+        # 删除已存在的段落
+        session.query(SpeechSegment).filter(SpeechSegment.recording_id == recording_id).delete()
+        
+        # 添加新段落
+        if segments:
+            session.execute(insert(SpeechSegment), [
+                {
+                    "recording_id": recording_id,
+                    "speaker_id": segment.get("speaker_id"),
+                    "speaker_name": segment.get("speaker_name"),
+                    "speaker_color": segment.get("speaker_color"),
+                    "content": segment.get("content", ""),
+                    "start_time": segment.get("start_time", 0),
+                    "end_time": segment.get("end_time", 0),
+                    "confidence": segment.get("confidence", 0)
+                }
+                for segment in segments
+            ])
+        
+        # 同步更新全文
+        session.query(Recording).filter(Recording.id == recording_id).update(
+            {Recording.full_text: " ".join(segment.get("content", "") for segment in segments)},
+            synchronize_session=False
+        )
+    
+    def get_full_text(self, recording_id: str) -> Optional[str]:
+        """获取录音全文（保存段落时写入；旧数据或段落被逐条修改后为None，调用方需回退到拼接段落）"""
+        try:
+            with self.get_session() as session:
+                row = session.query(Recording.full_text).filter(Recording.id == recording_id).first()
+                return row.full_text if row else None
+                
+        except Exception as e:
+            logger.error(f"获取录音全文失败: {str(e)}")
+            return None
+    
     def get_segments(self, recording_id: str) -> List[Dict[str, Any]]:
         """获取发言段落"""
         try:
@@ -280,20 +373,7 @@ class DatabaseManager:
         """保存智能摘要"""
         try:
             with self.get_session() as session:
-                # 删除已存在的摘要
-                session.query(Summary).filter(Summary.recording_id == recording_id).delete()
-                
-                # 添加新摘要
-                summary = Summary(
-                    recording_id=recording_id,
-                    summary_type=summary_data.get("summary_type", "meeting"),
-                    content=summary_data.get("content", ""),
-                    quality=summary_data.get("quality", 3),
-                    word_count=summary_data.get("word_count", 0),
-                    key_points=summary_data.get("key_points", []),
-                    compression_ratio=summary_data.get("compression_ratio", 0)
-                )
-                session.add(summary)
+                self._replace_summary(session, recording_id, summary_data)
                 session.commit()
                 
                 logger.info(f"保存摘要到录音 {recording_id}")
@@ -303,6 +383,22 @@ class DatabaseManager:
             logger.error(f"保存摘要失败: {str(e)}")
             return False
     
+    def _replace_summary(self, session: Session, recording_id: str, summary_data: Dict[str, Any]):
+        """在给定会话中替换录音的摘要（不提交）"""
+        # 删除已存在的摘要
+        session.query(Summary).filter(Summary.recording_id == recording_id).delete()
+        
+        # 添加新摘要
+        session.add(Summary(
+            recording_id=recording_id,
+            summary_type=summary_data.get("summary_type", "meeting"),
+            content=summary_data.get("content", ""),
+            quality=summary_data.get("quality", 3),
+            word_count=summary_data.get("word_count", 0),
+            key_points=summary_data.get("key_points", []),
+            compression_ratio=summary_data.get("compression_ratio", 0)
+        ))
+    
     def get_summary(self, recording_id: str) -> Optional[Dict[str, Any]]:
         """获取智能摘要"""
         try:
@@ -329,20 +425,7 @@ class DatabaseManager:
         """保存关键词"""
         try:
             with self.get_session() as session:
-                # 删除已存在的关键词
-                session.query(Keyword).filter(Keyword.recording_id == recording_id).delete()
-                
-                # 添加新关键词
-                for kw in keywords:
-                    keyword = Keyword(
-                        recording_id=recording_id,
-                        keyword=kw.get("word", ""),
-                        frequency=kw.get("count", 1),
-                        importance_score=kw.get("score", 0),
-                        source=kw.get("source", "ai")
-                    )
-                    session.add(keyword)
-                
+                self._replace_keywords(session, recording_id, keywords)
                 session.commit()
                 logger.info(f"保存 {len(keywords)} 个关键词到录音 {recording_id}")
                 return True
@@ -351,6 +434,54 @@ class DatabaseManager:
             logger.error(f"保存关键词失败: {str(e)}")
             return False
     
+    def _replace_keywords(self, session: Session, recording_id: str, keywords: List[Dict[str, Any]]):
+        """在给定会话中替换录音的关键词（一次executemany批量插入，不提交）"""
+        # 删除已存在的关键词
+        session.query(Keyword).filter(Keyword.recording_id == recording_id).delete()
+        
+        # 添加新关键词
+        if keywords:
+            session.execute(insert(Keyword), [
+                {
+                    "recording_id": recording_id,
+                    "keyword": kw.get("word", ""),
+                    "frequency": kw.get("count", 1),
+                    "importance_score": kw.get("score", 0),
+                    "source": kw.get("source", "ai")
+                }
+                for kw in keywords
+            ])
+    
+    def save_offline_results(
+        self,
+        recording_id: str,
+        segments: List[Dict[str, Any]],
+        summary_data: Optional[Dict[str, Any]],
+        keywords: Optional[List[Dict[str, Any]]],
+        status: str
+    ) -> bool:
+        """在一个事务中保存离线处理的段落、摘要、关键词并更新录音状态"""
+        try:
+            with self.get_session() as session:
+                self._replace_segments(session, recording_id, segments)
+                if summary_data:
+                    self._replace_summary(session, recording_id, summary_data)
+                if keywords:
+                    self._replace_keywords(session, recording_id, keywords)
+                
+                recording = session.query(Recording).filter(Recording.id == recording_id).first()
+                if recording:
+                    recording.status = status
+                    recording.update_time = datetime.utcnow()
+                
+                session.commit()
+                logger.info(f"保存离线处理结果到录音 {recording_id}: {len(segments)} 个段落")
+                return True
+                
+        except Exception as e:
+            logger.error(f"保存离线处理结果失败: {str(e)}")
+            return False
+    
     def get_keywords(self, recording_id: str) -> List[Dict[str, Any]]:
         """获取关键词"""
         try:
@@ -5,27 +5,28 @@ SenseVoice 实时语音识别服务 - 主服务器文件
 import argparse
 import asyncio
 import traceback
-import json
 import time
 import os
+import sys
 from typing import Optional
 from urllib.parse import parse_qs
 
 import uvicorn
 import numpy as np
+import orjson
 from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect, UploadFile, File, Form, Depends
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import ORJSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 from loguru import logger
 from pydantic import BaseModel
 
-from config import setup_logging, config
-from model_service import model_service_lifespan, async_vad_generate, asr_async
+from config import setup_logging, config, ui_config
+from model_service import model_service_lifespan, async_vad_generate, async_sv_embedding, asr_async
 from audio_buffer import AudioBuffer, CircularAudioBuffer
-from speaker_recognition import diarize_speaker_online_improved_async
+from speaker_recognition import SpeakerGallery, diarize_speaker_online_improved_async
 from text_processing import format_str_v3, contains_chinese_english_number
 from recording_service import recording_processor
 from database import db_manager
@@ -96,7 +97,8 @@ app = FastAPI(
     title="SenseVoice实时语音识别服务",
     description="基于SenseVoice的实时语音识别和说话人验证服务",
     version="2.0.0",
-    lifespan=model_service_lifespan
+    lifespan=model_service_lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # 添加CORS中间件
@@ -127,7 +129,7 @@ async def custom_exception_handler(request: Request, exc: Exception):
         status_code = 500
         message = "Internal server error: " + str(exc)
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status_code,
         content=TranscriptionResponse(
             code=status_code,
@@ -369,19 +371,17 @@ async def download_recording(recording_id: str):
             logger.error(f"录音记录 {recording_id} 没有文件路径")
             raise HTTPException(status_code=404, detail="录音文件路径不存在")
             
-        if not os.path.exists(file_path):
+        # 只stat一次，结果直接交给FileResponse复用
+        try:
+            stat_result = os.stat(file_path)
+        except FileNotFoundError:
             logger.error(f"录音文件不存在于路径: {file_path}")
             raise HTTPException(status_code=404, detail=f"录音文件不存在: {file_path}")
         
-        # 确定正确的媒体类型
-        if file_path.lower().endswith('.wav'):
-            media_type = 'audio/wav'
-        elif file_path.lower().endswith('.mp3'):
-            media_type = 'audio/mpeg'
-        elif file_path.lower().endswith('.m4a'):
-            media_type = 'audio/mp4'
-        else:
-            media_type = 'audio/wav'  # 默认为wav
+        # 媒体类型在入库时确定，旧记录按扩展名推断
+        media_type = recording.get("mediaType") or ui_config.AUDIO_MEDIA_TYPES.get(
+            os.path.splitext(file_path)[1].lower(), 'audio/wav'
+        )
         
         # 获取原始文件名
         original_filename = os.path.basename(file_path)
@@ -390,6 +390,7 @@ async def download_recording(recording_id: str):
             path=file_path,
             filename=original_filename,
             media_type=media_type,
+            stat_result=stat_result,
             headers={
                 "Content-Disposition": f'inline; filename="{original_filename}"',
                 "Accept-Ranges": "bytes"
@@ -587,6 +588,160 @@ async def get_speaker_settings_log(recording_id: str):
         raise HTTPException(status_code=500, detail=f"获取失败: {str(e)}")
 
 
+async def _transcription_session_worker(queue: asyncio.Queue, websocket: WebSocket, lang: str, sv: bool):
+    """
+    会话级ASR工作协程
+    
+    从队列中取出积压的VAD片段，执行说话人识别、语音识别，
+    并将本轮结果以JSON数组一次发送，使接收/VAD循环不会被较慢的ASR阻塞。
+    """
+    cache_asr = {}
+    
+    # 为当前连接创建独立的声纹库和计数器
+    speaker_gallery = SpeakerGallery()
+    speaker_counter = 0
+    speaker_history = []
+    current_speaker = None
+    
+    # 换行逻辑状态追踪
+    last_speaker_id = None
+    last_segment_end_time = 0.0
+    pause_threshold_ms = config.pause_threshold_ms  # 从配置中获取停顿阈值
+    
+    # 声纹结果短时复用：距上次声纹识别的片段很近且无长停顿时沿用当前说话人
+    sv_reuse_window_ms = min(config.sv_cache_ttl_ms, pause_threshold_ms)
+    last_sv_end_time = -1.0
+    
+    while True:
+        # 取出当前积压的全部片段，本轮结果合并为一个JSON数组只发送一帧
+        batch = [await queue.get()]
+        while not queue.empty():
+            batch.append(queue.get_nowait())
+        pending_responses = []
+        
+        # 本轮所有片段并发进行语音识别（请求会在批处理队列中合并）
+        asr_results = await asyncio.gather(
+            *(asr_async(segment_audio, lang, cache_asr, True) for segment_audio, _, _ in batch),
+            return_exceptions=True
+        )
+        
+        # 只有识别出有效文本的片段才做声纹识别；按时间顺序预判哪些片段可复用当前说话人，其余片段需要声纹嵌入
+        sv_plan = []
+        planned_sv_end_time = last_sv_end_time
+        planned_has_speaker = current_speaker is not None
+        for (segment_audio, vad_beg, vad_end), result in zip(batch, asr_results):
+            has_text = (
+                not isinstance(result, BaseException) and bool(result)
+                and contains_chinese_english_number(result[0].get('text', ''))
+            )
+            use_sv = sv and has_text and len(segment_audio) > 0
+            reuse_planned = (
+                use_sv and planned_has_speaker and planned_sv_end_time >= 0
+                and vad_beg - planned_sv_end_time < sv_reuse_window_ms
+            )
+            if use_sv and not reuse_planned:
+                planned_sv_end_time = vad_end
+                planned_has_speaker = True
+            sv_plan.append((use_sv, reuse_planned))
+        
+        # 需要声纹嵌入的片段并发提取
+        embeddings = await asyncio.gather(
+            *(async_sv_embedding(segment_audio) if use_sv and not reuse_planned else asyncio.sleep(0)
+              for (segment_audio, _, _), (use_sv, reuse_planned) in zip(batch, sv_plan)),
+            return_exceptions=True
+        )
+        
+        # 按片段顺序处理结果，保证说话人状态与换行逻辑的时序
+        for (segment_audio, vad_beg, vad_end), (use_sv, reuse_planned), result, embedding in zip(batch, sv_plan, asr_results, embeddings):
+            reuse_speaker = (
+                reuse_planned and current_speaker is not None and last_sv_end_time >= 0
+                and vad_beg - last_sv_end_time < sv_reuse_window_ms
+            )
+            try:
+                if isinstance(result, BaseException):
+                    raise result
+                logger.info(f"asr response: {result}")
+            
+                if result is not None and contains_chinese_english_number(result[0]['text']):
+                    speaker_id = current_speaker if reuse_speaker else "发言人"  # 默认ID
+                    if use_sv and not reuse_speaker:
+                        # 使用改进的异步说话人识别算法
+                        try:
+                            if embedding is None:
+                                # 预判可复用但前序片段未完成声纹识别，补做嵌入提取
+                                embedding = await async_sv_embedding(segment_audio)
+                            if isinstance(embedding, BaseException):
+                                raise embedding
+                            speaker_id, speaker_gallery, speaker_counter, speaker_history, current_speaker = await diarize_speaker_online_improved_async(
+                                segment_audio, speaker_gallery, speaker_counter, config.sv_thr,
+                                speaker_history, current_speaker, embedding=embedding
+                            )
+                            last_sv_end_time = vad_end
+                        except Exception as e:
+                            logger.error(f"Speaker verification error: {e}")
+                            speaker_id = "发言人"
+                    
+                    formatted_text = format_str_v3(result[0]['text'])
+                
+                    # 计算当前时间戳
+                    current_timestamp = time.time()
+                    current_segment_start_time = vad_beg  # VAD开始时间
+                
+                    # 判断是否需要换行
+                    is_new_line = False
+                    segment_type = "continue"
+                
+                    if config.enable_smart_line_break:
+                        # 智能换行模式
+                        # 1. 发言人变化检测
+                        if last_speaker_id is not None and speaker_id != last_speaker_id:
+                            is_new_line = True
+                            segment_type = "new_speaker"
+                            logger.info(f"Speaker changed: {last_speaker_id} -> {speaker_id}")
+                    
+                        # 2. 停顿检测（只有在同一发言人时才检测停顿）
+                        elif last_speaker_id == speaker_id and last_segment_end_time > 0:
+                            pause_duration = current_segment_start_time - last_segment_end_time
+                            if pause_duration > pause_threshold_ms:
+                                is_new_line = True
+                                segment_type = "pause"
+                                logger.info(f"Long pause detected: {pause_duration:.1f}ms > {pause_threshold_ms}ms")
+                    
+                        # 3. 首次识别
+                        elif last_speaker_id is None:
+                            is_new_line = True
+                            segment_type = "new_speaker"
+                            logger.info(f"First speech segment from {speaker_id}")
+                    else:
+                        # 传统模式：每次都换行
+                        is_new_line = True
+                        segment_type = "traditional"
+                
+                    # 生成最终数据（只包含纯文本，发言人信息通过单独字段传递）
+                    final_data = formatted_text
+                
+                    # 直接构建响应字典（字段与TranscriptionResponse一致），跳过pydantic校验和model_dump
+                    pending_responses.append({
+                        "code": 0,
+                        "msg": orjson.dumps(result[0]).decode(),
+                        "data": final_data,
+                        "speaker_id": speaker_id,
+                        "is_new_line": is_new_line,
+                        "segment_type": segment_type,
+                        "timestamp": current_timestamp,
+                    })
+                
+                    # 更新状态
+                    last_speaker_id = speaker_id
+                    last_segment_end_time = vad_end
+                
+            except Exception as e:
+                logger.error(f"ASR processing error: {e}")
+        
+        if pending_responses:
+            await websocket.send_text(orjson.dumps(pending_responses).decode())
+
+
 @app.websocket("/ws/transcribe")
 async def websocket_transcribe_endpoint(websocket: WebSocket):
     """
@@ -598,6 +753,7 @@ async def websocket_transcribe_endpoint(websocket: WebSocket):
     
     示例: ws://localhost:26000/ws/transcribe?sv=true&lang=auto
     """
+    worker = None
     try:
         # 解析查询参数
         query_params = parse_qs(websocket.scope['query_string'].decode())
@@ -613,76 +769,84 @@ async def websocket_transcribe_endpoint(websocket: WebSocket):
         audio_buffer = AudioBuffer(max_size=config.audio_buffer_max_size)
         vad_buffer_size = config.sample_rate * config.vad_buffer_seconds
         audio_vad = CircularAudioBuffer(max_samples=vad_buffer_size)
+        # 预分配的chunk缓冲区，整个会话复用，避免每个chunk分配新数组
+        chunk_buf = np.empty(chunk_size, dtype=np.float32)
         
         cache_vad = {}
-        cache_asr = {}
         last_vad_beg = last_vad_end = -1
-        offset = 0
+        offset_samples = 0  # VAD缓冲区起点对应的流内样本位置
         
-        # 为当前连接创建独立的声纹库和计数器
-        speaker_gallery = {}
-        speaker_counter = 0
-        speaker_history = []
-        current_speaker = None
+        # VAD片段交给独立的工作协程做ASR，队列有界以限制ASR变慢时的内存占用
+        segment_queue = asyncio.Queue(maxsize=config.asr_queue_max_size)
+        worker = asyncio.create_task(_transcription_session_worker(segment_queue, websocket, lang.strip(), sv))
         
-        # 换行逻辑状态追踪
-        last_speaker_id = None
-        last_segment_end_time = 0.0
-        pause_threshold_ms = config.pause_threshold_ms  # 从配置中获取停顿阈值
-        
-        buffer = b""
+        buffer = bytearray()
+        # int16转float32的复用缓冲区，收到更大的数据包时再扩容
+        pcm_scratch = np.empty(chunk_size, dtype=np.float32)
+        pcm_scale = np.float32(1.0 / 32767.0)
         logger.info(f"WebSocket session started with chunk_size={chunk_size}, vad_buffer_size={vad_buffer_size}")
         
-        # VAD缓冲区管理
-        last_activity_time = 0  # 最后活动时间
+        # VAD缓冲区管理（阈值预先换算为样本数，每个chunk只做整数比较）
         total_processed_samples = 0  # 总处理样本数
+        cleanup_trigger_samples = int(vad_buffer_size * config.vad_buffer_cleanup_threshold)
+        cleanup_samples = int(vad_buffer_size * config.vad_buffer_cleanup_ratio)
+        silence_reset_samples = config.silence_reset_seconds * config.sample_rate
+        keep_samples = int(config.keep_audio_seconds * config.sample_rate)
+        silence_deadline = silence_reset_samples  # 最后活动位置 + 静音重置阈值
+        overlap_samples = int(0.1 * config.sample_rate)  # 片段清理时保留100ms重叠
         
         # 音频处理主循环
         while True:
             data = await websocket.receive_bytes()
-            buffer += data
-            if len(buffer) < 2:
+            if worker.done():
+                # 工作协程异常退出后不再接收音频，否则片段只会在队列中堆积并被丢弃，客户端也收不到任何结果
+                raise RuntimeError("Transcription worker stopped unexpectedly")
+            buffer.extend(data)
+            num_samples = len(buffer) // 2
+            if num_samples == 0:
                 continue
+            
+            if num_samples > len(pcm_scratch):
+                pcm_scratch = np.empty(num_samples, dtype=np.float32)
                 
-            # 将字节数据转换为浮点数音频数据
-            new_audio_data = np.frombuffer(
-                buffer[:len(buffer) - (len(buffer) % 2)], 
-                dtype=np.int16
-            ).astype(np.float32) / 32767.0
+            # 将字节数据转换为浮点数音频数据（写入复用缓冲区，append时会复制）
+            pcm = np.frombuffer(buffer, dtype=np.int16, count=num_samples)
+            np.multiply(pcm, pcm_scale, out=pcm_scratch[:num_samples])
+            del pcm  # 释放对bytearray的引用，之后才能原地删除已消费的字节
             
-            audio_buffer.append(new_audio_data)
-            buffer = buffer[len(buffer) - (len(buffer) % 2):]
+            audio_buffer.append(pcm_scratch[:num_samples])
+            del buffer[:num_samples * 2]
 
             # 处理音频chunk
             while len(audio_buffer) >= chunk_size:
-                # 从主缓冲区获取一个chunk
-                chunk = audio_buffer.pop_front(chunk_size)
+                # 从主缓冲区取出一个chunk到预分配缓冲区
+                audio_buffer.pop_front_into(chunk_buf)
                 
-                # 将chunk添加到VAD缓冲区
-                audio_vad.append(chunk)
+                # 将chunk添加到VAD缓冲区（复制进循环缓冲区）
+                audio_vad.append(chunk_buf)
                 total_processed_samples += chunk_size
                 
-                # 检查VAD缓冲区是否接近满容量，如果是则清理一部分
-                if len(audio_vad) > vad_buffer_size * config.vad_buffer_cleanup_threshold:
-                    cleanup_samples = int(vad_buffer_size * config.vad_buffer_cleanup_ratio)
-                    audio_vad.pop_front(cleanup_samples)
-                    offset += cleanup_samples / config.sample_rate * 1000
-                    logger.debug(f"VAD buffer cleanup: removed {cleanup_samples} samples, new offset: {offset:.1f}ms")
+                # 缓冲区清理和长静音重置共用一次判断，通常情况下直接跳过
+                if audio_vad.size > cleanup_trigger_samples or total_processed_samples > silence_deadline:
+                    # 检查VAD缓冲区是否接近满容量，如果是则清理一部分
+                    if audio_vad.size > cleanup_trigger_samples:
+                        audio_vad.discard_front(cleanup_samples)
+                        offset_samples += cleanup_samples
+                        logger.debug(f"VAD buffer cleanup: removed {cleanup_samples} samples, new offset: {offset_samples} samples")
+                    
+                    # 检查长时间无语音活动，只保留最近几秒的音频
+                    if total_processed_samples > silence_deadline:
+                        silence_duration = (total_processed_samples - silence_deadline + silence_reset_samples) / config.sample_rate
+                        logger.info(f"Long silence detected ({silence_duration:.1f}s), trimming VAD buffer")
+                        # 保留最近几秒的音频数据
+                        if audio_vad.size > keep_samples:
+                            discard_samples = audio_vad.size - keep_samples
+                            audio_vad.discard_front(discard_samples)
+                            offset_samples += discard_samples
+                        silence_deadline = total_processed_samples + silence_reset_samples
                 
                 # 使用异步VAD推理
-                res = await async_vad_generate(chunk, cache_vad, config.chunk_size_ms)
-                
-                # 检查长时间无语音活动，重置offset以避免累积误差
-                silence_duration = (total_processed_samples - last_activity_time) / config.sample_rate
-                if silence_duration > config.silence_reset_seconds:
-                    logger.info(f"Long silence detected ({silence_duration:.1f}s), resetting VAD buffer offset")
-                    # 保留最近几秒的音频数据
-                    keep_samples = int(config.keep_audio_seconds * config.sample_rate)
-                    if len(audio_vad) > keep_samples:
-                        discard_samples = len(audio_vad) - keep_samples
-                        audio_vad.pop_front(discard_samples)
-                        offset += discard_samples / config.sample_rate * 1000
-                    last_activity_time = total_processed_samples
+                res = await async_vad_generate(chunk_buf, cache_vad, config.chunk_size_ms)
                 
                 if len(res[0]["value"]):
                     for segment in res[0]["value"]:
@@ -693,10 +857,11 @@ async def websocket_transcribe_endpoint(websocket: WebSocket):
                         
                         if last_vad_beg > -1 and last_vad_end > -1:
                             # 更新最后活动时间
-                            last_activity_time = total_processed_samples
+                            silence_deadline = total_processed_samples + silence_reset_samples
                             
-                            beg = int((last_vad_beg - offset) * config.sample_rate / 1000)
-                            end = int((last_vad_end - offset) * config.sample_rate / 1000)
+                            # VAD时间戳为毫秒，换算为样本位置后减去缓冲区起点（纯整数运算）
+                            beg = last_vad_beg * config.sample_rate // 1000 - offset_samples
+                            end = last_vad_end * config.sample_rate // 1000 - offset_samples
                             
                             # 确保索引不超出VAD缓冲区范围
                             vad_buffer_length = len(audio_vad)
@@ -704,91 +869,21 @@ async def websocket_transcribe_endpoint(websocket: WebSocket):
                                 end = min(end, vad_buffer_length)
                                 segment_length = end - beg
                                 
+                                # 片段会交给工作协程异步处理，期间缓冲区仍在写入，因此需要复制出来
                                 segment_audio = audio_vad.get_range(beg, segment_length)
                                 logger.info(f"[vad segment] audio_len: {len(segment_audio)}, beg: {beg}, end: {end}")
-
-                                speaker_id = "发言人"  # 默认ID
-                                if sv and len(segment_audio) > 0:
-                                    # 使用改进的异步说话人识别算法
-                                    try:
-                                        speaker_id, speaker_gallery, speaker_counter, speaker_history, current_speaker = await diarize_speaker_online_improved_async(
-                                            segment_audio, speaker_gallery, speaker_counter, config.sv_thr,
-                                            speaker_history, current_speaker
-                                        )
-                                    except Exception as e:
-                                        logger.error(f"Speaker verification error: {e}")
-                                        speaker_id = "发言人"
                                 
-                                # 进行异步语音识别
-                                try:
-                                    result = await asr_async(segment_audio, lang.strip(), cache_asr, True)
-                                    logger.info(f"asr response: {result}")
-                                    
-                                    if result is not None and contains_chinese_english_number(result[0]['text']):
-                                        formatted_text = format_str_v3(result[0]['text'])
-                                        
-                                        # 计算当前时间戳
-                                        current_timestamp = time.time()
-                                        current_segment_start_time = last_vad_beg  # VAD开始时间
-                                        
-                                        # 判断是否需要换行
-                                        is_new_line = False
-                                        segment_type = "continue"
-                                        
-                                        if config.enable_smart_line_break:
-                                            # 智能换行模式
-                                            # 1. 发言人变化检测
-                                            if last_speaker_id is not None and speaker_id != last_speaker_id:
-                                                is_new_line = True
-                                                segment_type = "new_speaker"
-                                                logger.info(f"Speaker changed: {last_speaker_id} -> {speaker_id}")
-                                            
-                                            # 2. 停顿检测（只有在同一发言人时才检测停顿）
-                                            elif last_speaker_id == speaker_id and last_segment_end_time > 0:
-                                                pause_duration = current_segment_start_time - last_segment_end_time
-                                                if pause_duration > pause_threshold_ms:
-                                                    is_new_line = True
-                                                    segment_type = "pause"
-                                                    logger.info(f"Long pause detected: {pause_duration:.1f}ms > {pause_threshold_ms}ms")
-                                            
-                                            # 3. 首次识别
-                                            elif last_speaker_id is None:
-                                                is_new_line = True
-                                                segment_type = "new_speaker"
-                                                logger.info(f"First speech segment from {speaker_id}")
-                                        else:
-                                            # 传统模式：每次都换行
-                                            is_new_line = True
-                                            segment_type = "traditional"
-                                        
-                                        # 生成最终数据（只包含纯文本，发言人信息通过单独字段传递）
-                                        final_data = formatted_text
-                                        
-                                        # 创建响应
-                                        response = TranscriptionResponse(
-                                            code=0,
-                                            msg=json.dumps(result[0], ensure_ascii=False),
-                                            data=final_data,
-                                            speaker_id=speaker_id,
-                                            is_new_line=is_new_line,
-                                            segment_type=segment_type,
-                                            timestamp=current_timestamp
-                                        )
-                                        await websocket.send_json(response.model_dump())
-                                        
-                                        # 更新状态
-                                        last_speaker_id = speaker_id
-                                        last_segment_end_time = last_vad_end
-                                        
-                                except Exception as e:
-                                    logger.error(f"ASR processing error: {e}")
+                                # 提交给ASR工作协程；队列满时丢弃最旧的片段，保证接收不被阻塞
+                                if segment_queue.full():
+                                    dropped_audio, dropped_beg, dropped_end = segment_queue.get_nowait()
+                                    logger.warning(f"ASR queue full, dropping oldest segment: {dropped_beg}-{dropped_end}ms")
+                                segment_queue.put_nowait((segment_audio, last_vad_beg, last_vad_end))
                                 
                                 # 清理已处理的VAD数据（保留一些重叠以确保连续性）
-                                overlap_samples = int(0.1 * config.sample_rate)  # 100ms重叠
                                 clear_length = max(0, end - overlap_samples)
                                 if clear_length > 0:
-                                    audio_vad.pop_front(clear_length)
-                                    offset += clear_length / config.sample_rate * 1000  # 转换为毫秒
+                                    audio_vad.discard_front(clear_length)
+                                    offset_samples += clear_length
                                 
                                 last_vad_beg = last_vad_end = -1
                                 
@@ -798,6 +893,14 @@ async def websocket_transcribe_endpoint(websocket: WebSocket):
         logger.error(f"Unexpected error: {e}\nCall stack:\n{traceback.format_exc()}")
         await websocket.close()
     finally:
+        if worker is not None:
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.error(f"Transcription worker error: {e}\nCall stack:\n{''.join(traceback.format_exception(type(e), e, e.__traceback__))}")
         logger.info("Cleaned up resources after WebSocket disconnect")
 
 
@@ -859,6 +962,11 @@ if __name__ == "__main__":
             run_kwargs["ssl_certfile"] = args.certfile
             logger.info(f"SSL已启用: 证书={args.certfile}, 密钥={args.keyfile}")
         
+        # 使用C实现的事件循环和HTTP解析器（uvloop不支持Windows）
+        run_kwargs["http"] = "httptools"
+        if sys.platform != "win32":
+            run_kwargs["loop"] = "uvloop"
+        
         if args.workers > 1:
             run_kwargs["workers"] = args.workers
             
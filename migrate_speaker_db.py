@@ -17,61 +17,56 @@ def migrate_speaker_tables():
         return False
     
     try:
-        # 连接到数据库
+        # 连接到数据库（WAL模式写入数据库文件，运行时的日志写入不会阻塞读取；
+        # synchronous和temp_store只对本次迁移连接生效，应用连接由DatabaseManager单独设置）
         conn = sqlite3.connect(db_path)
+        conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        """)
         cursor = conn.cursor()
         
-        # 1. 创建常用发言人表
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='frequent_speakers'")
-        if not cursor.fetchone():
-            cursor.execute('''
-            CREATE TABLE frequent_speakers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name VARCHAR(100) NOT NULL UNIQUE,
-                color VARCHAR(20) NOT NULL DEFAULT '#409eff',
-                use_count INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_id VARCHAR(100) DEFAULT 'default_user'
-            )
-            ''')
-            logger.info("✅ 创建 frequent_speakers 表")
-        else:
-            logger.info("ℹ️  frequent_speakers 表已存在")
-        
-        # 2. 创建发言人设置日志表
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='speaker_settings_log'")
-        if not cursor.fetchone():
-            cursor.execute('''
-            CREATE TABLE speaker_settings_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                recording_id VARCHAR(255) NOT NULL,
-                speaker_id VARCHAR(50) NOT NULL,
-                old_name VARCHAR(100),
-                new_name VARCHAR(100) NOT NULL,
-                setting_type VARCHAR(20) NOT NULL,
-                frequent_speaker_id INTEGER,
-                user_id VARCHAR(100) DEFAULT 'default_user',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (recording_id) REFERENCES recordings(id) ON DELETE CASCADE,
-                FOREIGN KEY (frequent_speaker_id) REFERENCES frequent_speakers(id) ON DELETE SET NULL
-            )
-            ''')
-            logger.info("✅ 创建 speaker_settings_log 表")
-        else:
-            logger.info("ℹ️  speaker_settings_log 表已存在")
-        
-        # 3. 创建索引
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_frequent_speakers_user_id ON frequent_speakers(user_id)",
-            "CREATE INDEX IF NOT EXISTS idx_frequent_speakers_use_count ON frequent_speakers(use_count DESC)",
-            "CREATE INDEX IF NOT EXISTS idx_speaker_settings_log_recording_id ON speaker_settings_log(recording_id)",
-            "CREATE INDEX IF NOT EXISTS idx_speaker_settings_log_speaker_id ON speaker_settings_log(speaker_id)"
-        ]
-        
-        for index_sql in indexes:
-            cursor.execute(index_sql)
-        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name IN ('frequent_speakers', 'speaker_settings_log')")
+        existing_tables = {row[0] for row in cursor.fetchall()}
+        
+        # 1-3. 一次性创建常用发言人表、发言人设置日志表和索引
+        conn.executescript('''
+        CREATE TABLE IF NOT EXISTS frequent_speakers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name VARCHAR(100) NOT NULL UNIQUE,
+            color VARCHAR(20) NOT NULL DEFAULT '#409eff',
+            use_count INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id VARCHAR(100) DEFAULT 'default_user'
+        );
+        
+        CREATE TABLE IF NOT EXISTS speaker_settings_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recording_id VARCHAR(255) NOT NULL,
+            speaker_id VARCHAR(50) NOT NULL,
+            old_name VARCHAR(100),
+            new_name VARCHAR(100) NOT NULL,
+            setting_type VARCHAR(20) NOT NULL,
+            frequent_speaker_id INTEGER,
+            user_id VARCHAR(100) DEFAULT 'default_user',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (recording_id) REFERENCES recordings(id) ON DELETE CASCADE,
+            FOREIGN KEY (frequent_speaker_id) REFERENCES frequent_speakers(id) ON DELETE SET NULL
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_frequent_speakers_user_id ON frequent_speakers(user_id);
+        CREATE INDEX IF NOT EXISTS idx_frequent_speakers_use_count ON frequent_speakers(use_count DESC);
+        CREATE INDEX IF NOT EXISTS idx_speaker_settings_log_recording_id ON speaker_settings_log(recording_id);
+        CREATE INDEX IF NOT EXISTS idx_speaker_settings_log_speaker_id ON speaker_settings_log(speaker_id);
+        ''')
+        
+        for table_name in ('frequent_speakers', 'speaker_settings_log'):
+            if table_name in existing_tables:
+                logger.info(f"ℹ️  {table_name} 表已存在")
+            else:
+                logger.info(f"✅ 创建 {table_name} 表")
         logger.info("✅ 创建数据库索引")
         
         # 4. 插入示例数据
@@ -87,11 +82,10 @@ def migrate_speaker_tables():
                 ('赵六', '#a29bfe', 1)
             ]
             
-            for name, color, use_count in sample_speakers:
-                cursor.execute('''
-                INSERT INTO frequent_speakers (name, color, use_count, last_used_at) 
-                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-                ''', (name, color, use_count))
+            cursor.executemany('''
+            INSERT INTO frequent_speakers (name, color, use_count, last_used_at) 
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ''', sample_speakers)
             
             logger.info("✅ 插入示例常用发言人数据")
         else:
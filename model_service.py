@@ -5,10 +5,12 @@
 import asyncio
 import time
 from concurrent.futures import ThreadPoolExecutor
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext
+from functools import partial
 from typing import Optional
 
 import numpy as np
+import torch
 from funasr import AutoModel
 from loguru import logger
 from modelscope.pipelines import pipeline
@@ -28,6 +30,10 @@ sv_pipeline = None
 model_asr = None
 model_vad = None
 
+# ASR批处理队列（元素为 (audio, lang, use_itn, future)），由lifespan创建
+asr_queue: Optional[asyncio.Queue] = None
+asr_worker_task: Optional[asyncio.Task] = None
+
 
 def initialize_models():
     """初始化所有AI模型"""
@@ -39,10 +45,21 @@ def initialize_models():
     sv_pipeline = pipeline(
         task='speaker-verification',
         model='iic/speech_campplus_sv_zh-cn_16k-common',
-        model_revision='v1.0.0'
+        model_revision='v1.0.0',
+        device="gpu" if config.use_gpu else "cpu"
     )
     logger.info("说话人验证模型(CAM++)加载完成")
     
+    # 可选：编译CAM++嵌入网络（特征提取仍为eager，输入长度可变因此使用动态形状）
+    if config.use_gpu and config.sv_compile:
+        try:
+            sv_pipeline.model.embedding_model = torch.compile(sv_pipeline.model.embedding_model, dynamic=True)
+            # 预热一次，把编译开销放在启动阶段
+            sv_embedding(np.random.randn(3 * config.sample_rate).astype(np.float32) * 0.01)
+            logger.info("CAM++嵌入网络已编译")
+        except Exception as e:
+            logger.warning(f"CAM++模型编译失败，使用eager模式: {e}")
+    
     # 加载语音识别模型 - 目前只有Small版本可用
     model_asr = AutoModel(
         model="iic/SenseVoiceSmall",
@@ -57,19 +74,35 @@ def initialize_models():
     model_vad = AutoModel(
         model="fsmn-vad",
         model_revision="v2.0.4",
+        device="cuda:0" if config.use_gpu else "cpu",
         disable_pbar=True,
         max_end_silence_time=500,
         disable_update=True,
     )
     logger.info("VAD模型加载完成")
     
+    warmup_models()
     logger.info("所有AI模型加载完成")
 
 
+def warmup_models():
+    """用一段短音频预先跑一次各模型，把CUDA/cuDNN初始化和内核选择放在启动阶段而不是首个请求"""
+    start_time = time.time()
+    # 低幅噪声而非全零，避免VAD/声纹模型对纯静音走特殊分支
+    dummy_audio = np.random.randn(config.sample_rate).astype(np.float32) * 0.01
+    try:
+        model_vad.generate(input=dummy_audio, cache={}, is_final=False, chunk_size=config.chunk_size_ms)
+        _asr_generate(dummy_audio, "auto", {}, False)
+        sv_embedding(dummy_audio)
+        logger.info(f"模型预热完成，耗时 {(time.time() - start_time) * 1000:.0f} ms")
+    except Exception as e:
+        logger.warning(f"模型预热失败，首个请求将承担初始化开销: {e}")
+
+
 # 异步包装函数
 async def async_vad_generate(chunk, cache_vad, chunk_size_ms):
     """异步VAD推理"""
-    loop = asyncio.get_event_loop()
+    loop = asyncio.get_running_loop()
     return await loop.run_in_executor(
         thread_pool_executor,
         lambda: model_vad.generate(
@@ -81,28 +114,129 @@ async def async_vad_generate(chunk, cache_vad, chunk_size_ms):
     )
 
 
-async def async_sv_pipeline(audio_pair):
-    """异步说话人验证"""
-    loop = asyncio.get_event_loop()
+def sv_embedding(audio):
+    """提取单段音频的L2归一化声纹嵌入（CAM++），嵌入间点积即余弦相似度"""
+    emb = np.asarray(sv_pipeline([audio], output_emb=True)["embs"][0], dtype=np.float32)
+    return emb / (np.linalg.norm(emb) + 1e-8)
+
+
+async def async_sv_embedding(audio):
+    """异步提取声纹嵌入"""
+    loop = asyncio.get_running_loop()
     return await loop.run_in_executor(
         thread_pool_executor,
-        lambda: sv_pipeline(audio_pair)
+        lambda: sv_embedding(audio)
     )
 
 
-async def async_asr_generate(audio, lang, cache, use_itn=False):
-    """异步语音识别"""
-    loop = asyncio.get_event_loop()
+def sv_embedding_batch(audios):
+    """一次管线调用提取多段音频的L2归一化声纹嵌入，返回 (N, D) 矩阵，行顺序与输入一致"""
+    embs = np.asarray(sv_pipeline(list(audios), output_emb=True)["embs"], dtype=np.float32)
+    return embs / (np.linalg.norm(embs, axis=1, keepdims=True) + 1e-8)
+
+
+async def async_sv_embedding_batch(audios):
+    """异步批量提取声纹嵌入"""
+    loop = asyncio.get_running_loop()
     return await loop.run_in_executor(
         thread_pool_executor,
-        lambda: model_asr.generate(
+        partial(sv_embedding_batch, list(audios))
+    )
+
+
+def _asr_autocast():
+    """GPU推理时启用FP16自动混合精度"""
+    if config.use_gpu and config.asr_fp16:
+        return torch.autocast("cuda", dtype=torch.float16)
+    return nullcontext()
+
+
+def _asr_generate(audio, lang, cache, use_itn, batch_size=1):
+    """同步语音识别（推理模式，按配置启用混合精度）"""
+    with torch.inference_mode(), _asr_autocast():
+        return model_asr.generate(
             input=audio,
             cache=cache,
-            language=lang.strip(),
+            language=lang,
             use_itn=use_itn,
+            batch_size=batch_size,
             batch_size_s=60,
         )
+
+
+def _asr_generate_batch(audios, lang, use_itn):
+    """一次模型调用识别多段音频，结果与输入顺序一致"""
+    audios = list(audios)
+    # funasr默认batch_size=1会逐段前向，显式指定批大小才能合并为一次前向计算
+    return _asr_generate(audios, lang, {}, use_itn, batch_size=max(1, len(audios)))
+
+
+async def asr_batch_worker():
+    """
+    ASR批处理工作协程
+    
+    收集短时间内来自不同会话的识别请求，按语言和ITN设置分组后合并为一次模型调用，
+    再把结果分发给各请求的future。
+    """
+    loop = asyncio.get_running_loop()
+    batch_timeout = config.asr_batch_timeout_ms / 1000
+    
+    while True:
+        batch = [await asr_queue.get()]
+        deadline = loop.time() + batch_timeout
+        while len(batch) < config.asr_batch_max_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(asr_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        groups = {}
+        for item in batch:
+            groups.setdefault((item[1], item[2]), []).append(item)
+        
+        for (lang, use_itn), items in groups.items():
+            try:
+                results = await loop.run_in_executor(
+                    thread_pool_executor,
+                    partial(_asr_generate_batch, [item[0] for item in items], lang, use_itn)
+                )
+                logger.debug(f"asr batch size: {len(items)}")
+                for item, res in zip(items, results):
+                    if not item[3].done():
+                        item[3].set_result([res])
+            except Exception as e:
+                for item in items:
+                    if not item[3].done():
+                        item[3].set_exception(e)
+
+
+async def async_asr_generate(audio, lang, cache, use_itn=False):
+    """异步语音识别（批处理队列可用时合并推理，cache仅在直接调用时使用）"""
+    if asr_queue is not None:
+        future = asyncio.get_running_loop().create_future()
+        await asr_queue.put((audio, lang.strip(), use_itn, future))
+        return await future
+    
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        thread_pool_executor,
+        lambda: _asr_generate(audio, lang.strip(), cache, use_itn)
+    )
+
+
+async def asr_async_batch(audios, lang, use_itn=False):
+    """异步批量语音识别：多段音频一次模型调用，结果与输入顺序一致（不经过批处理队列）"""
+    loop = asyncio.get_running_loop()
+    start_time = time.time()
+    results = await loop.run_in_executor(
+        thread_pool_executor,
+        partial(_asr_generate_batch, list(audios), lang.strip(), use_itn)
     )
+    logger.debug(f"asr batch of {len(audios)} elapsed: {(time.time() - start_time) * 1000:.2f} milliseconds")
+    return results
 
 
 async def asr_async(audio, lang, cache, use_itn=False):
@@ -118,13 +252,7 @@ async def asr_async(audio, lang, cache, use_itn=False):
 def asr(audio, lang, cache, use_itn=False):
     """保持原有同步函数以兼容其他地方的调用"""
     start_time = time.time()
-    result = model_asr.generate(
-        input=audio,
-        cache=cache,
-        language=lang.strip(),
-        use_itn=use_itn,
-        batch_size_s=60,
-    )
+    result = _asr_generate(audio, lang.strip(), cache, use_itn)
     end_time = time.time()
     elapsed_time = end_time - start_time
     logger.debug(f"asr elapsed: {elapsed_time * 1000:.2f} milliseconds")
@@ -135,10 +263,15 @@ def asr(audio, lang, cache, use_itn=False):
 async def model_service_lifespan(app):
     """模型服务生命周期管理"""
     # 应用启动
+    global asr_queue, asr_worker_task
     logger.info("Model service starting up...")
     initialize_models()
+    asr_queue = asyncio.Queue()
+    asr_worker_task = asyncio.create_task(asr_batch_worker())
     yield
     # 应用关闭
     logger.info("Model service shutting down...")
+    asr_worker_task.cancel()
+    asr_queue = None
     thread_pool_executor.shutdown(wait=True)
     logger.info("Thread pool executor shut down") 
\ No newline at end of file
@@ -1,14 +1,20 @@
 import os
+import re
+import time
 import asyncio
+import hashlib
+import functools
 import logging
 import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
+from collections import OrderedDict
 from datetime import datetime
 import tempfile
 import subprocess
 
 # 音频处理
 import librosa
+from scipy import fft as sp_fft
 try:
     import soundfile as sf
     SOUNDFILE_AVAILABLE = True
@@ -16,35 +22,57 @@ except ImportError:
     SOUNDFILE_AVAILABLE = False
     sf = None
 
-try:
-    import whisper
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
-
 # 数据库和现有模型
 from database import db_manager
+from ai_service import ai_service
 from speaker_recognition import diarize_speaker_online_improved_async
-from model_service import asr_async
+from model_service import asr_async, asr_async_batch, async_sv_embedding_batch
+from config import processing_config
 
 # 日志
 logger = logging.getLogger(__name__)
 
+# SenseVoice输出中的特殊标记（如<|zh|><|NEUTRAL|>）
+_SENSEVOICE_TAG_RE = re.compile(r'<\|[^|]+\|>')
+
 class OfflineAudioProcessor:
     """离线音频处理器 - 使用更精确的模型重新识别"""
     
+    # soundfile可直接解码的格式，其他格式会并行预先启动FFmpeg解码
+    _SOUNDFILE_EXTENSIONS = {".wav", ".flac", ".ogg"}
+    
+    # 短于该时长的段落不提取声纹，沿用上一段的说话人
+    _MIN_EMBEDDING_SECONDS = 1.5
+    
+    # 句末标点，段落不以这些符号结尾时补句号
+    _SENTENCE_END_PUNCTUATION = frozenset("。！？；")
+    
+    # 简单的中文数字转换表
+    _NUMBER_TRANSLATION = str.maketrans({
+        "一": "1", "二": "2", "三": "3", "四": "4", "五": "5",
+        "六": "6", "七": "7", "八": "8", "九": "9", "十": "10"
+    })
+    
     def __init__(self):
-        self.whisper_model = None
         self.sample_rate = 16000
         self.models_loaded = False
-        self._initialization_lock = asyncio.Lock() if hasattr(asyncio, '_get_running_loop') and asyncio._get_running_loop() else None
+        # 音频特征LRU缓存：音频内容哈希 -> {"volume", "pitch", "mfcc"}，重新处理同一录音时直接复用
+        self._feature_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._feature_cache_size = 512
+        # 离线识别结果LRU缓存：(录音ID, 文件路径, 修改时间, 大小, 语言, 发言人数) -> (转写结果, 合并说话人后的段落)
+        self._result_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._result_cache_size = 8
+        self._initialization_lock: Optional[asyncio.Lock] = None  # 首次使用时在运行中的事件循环内创建
+        # MFCC所需的梅尔滤波器组与汉宁窗，首次计算时生成
+        self._mel_basis: Optional[np.ndarray] = None
+        self._mfcc_window: Optional[np.ndarray] = None
     
     async def _ensure_models_loaded(self):
         """确保模型已加载"""
         if self.models_loaded:
             return
             
-        # 如果没有锁，创建一个
+        # 在事件循环内懒创建锁；检查与赋值之间没有await，不会被并发调用重复创建
         if self._initialization_lock is None:
             self._initialization_lock = asyncio.Lock()
             
@@ -59,20 +87,8 @@ class OfflineAudioProcessor:
         try:
             logger.info("开始加载离线处理模型...")
             
-            # 加载Whisper模型（中文效果很好）
-            if WHISPER_AVAILABLE:
-                try:
-                    logger.info("加载Whisper模型...")
-                    self.whisper_model = whisper.load_model("base")  # 使用base模型，更快更稳定
-                    logger.info("Whisper模型加载完成")
-                except Exception as e:
-                    logger.warning(f"Whisper模型加载失败，将使用SenseVoice降级方案: {e}")
-                    self.whisper_model = None
-            else:
-                logger.info("Whisper不可用，将使用SenseVoice进行转写")
-                self.whisper_model = None
-            
-            logger.info(f"离线处理模型初始化完成 - Whisper: {'✓' if self.whisper_model else '✗ (使用SenseVoice)'}")
+            # 离线转写使用已加载的SenseVoice模型，不再额外加载Whisper
+            logger.info("离线处理模型初始化完成 - 转写使用SenseVoice")
             logger.info("说话人分离将使用现有的CAM++模型和智能分割算法")
             
         except Exception as e:
@@ -83,7 +99,8 @@ class OfflineAudioProcessor:
     async def reprocess_recording(self, recording_id: str) -> Dict[str, Any]:
         """重新处理录音（离线高精度）"""
         try:
-            logger.info(f"开始离线重新处理录音: {recording_id}")
+            logger.info("开始离线重新处理录音: %s", recording_id)
+            start_time = time.perf_counter()
             
             # 0. 确保模型已初始化
             await self._ensure_models_loaded()
@@ -97,25 +114,48 @@ class OfflineAudioProcessor:
             if not file_path or not os.path.exists(file_path):
                 return {"success": False, "error": "录音文件不存在"}
             
-            # 2. 预处理音频
-            audio_data = await self._preprocess_audio(file_path)
-            if audio_data is None:
-                return {"success": False, "error": "音频预处理失败"}
-            
-            # 3. 离线语音识别（更准确）
-            logger.info("开始离线语音识别...")
-            transcription_result = await self._offline_transcribe(audio_data, file_path)
-            
-            # 4. 离线说话人分离（更准确）
-            logger.info("开始离线说话人分离...")
-            speaker_segments = await self._offline_speaker_diarization(
-                audio_data, file_path, transcription_result
-            )
-            
-            # 5. 合并转写和说话人信息
-            final_segments = self._merge_transcription_and_speakers(
-                transcription_result, speaker_segments
+            # 录音文件与影响识别的设置都未变化时直接复用上次的转写与说话人分离结果，跳过全部模型计算
+            # （按文件修改时间和大小判断是否变化，无需读取整个文件计算哈希；后处理选项在缓存之后应用，不参与缓存键）
+            file_stat = os.stat(file_path)
+            content_key = (
+                recording_id, file_path, file_stat.st_mtime_ns, file_stat.st_size,
+                recording.get("language"), recording.get("speakerCount")
             )
+            cached_result = self._result_cache.get(content_key)
+            if cached_result is not None:
+                self._result_cache.move_to_end(content_key)
+                logger.info("录音文件和识别设置未变化，复用离线识别结果: %s", recording_id)
+                transcription_result, final_segments = cached_result
+            else:
+                # 2. 预处理音频
+                audio_data = await self._preprocess_audio(file_path)
+                if audio_data is None:
+                    return {"success": False, "error": "音频预处理失败"}
+                
+                # 3. 离线语音识别（更准确）
+                stage_start = time.perf_counter()
+                transcription_result = await self._offline_transcribe(audio_data, file_path)
+                logger.info("离线语音识别完成: %d 个段落, 耗时 %.2f秒",
+                            len(transcription_result.get("segments", [])), time.perf_counter() - stage_start)
+                
+                # 4. 离线说话人分离（更准确）
+                stage_start = time.perf_counter()
+                speaker_segments = await self._offline_speaker_diarization(
+                    audio_data, file_path, transcription_result
+                )
+                logger.info("离线说话人分离完成: 检测到 %d 个说话人, 耗时 %.2f秒",
+                            len({seg["speaker"] for seg in speaker_segments}), time.perf_counter() - stage_start)
+                
+                # 5. 合并转写和说话人信息
+                final_segments = self._merge_transcription_and_speakers(
+                    transcription_result, speaker_segments
+                )
+                
+                # 演示内容说明处理失败，不缓存，下次重新处理
+                if not transcription_result.get("demo_mode"):
+                    self._result_cache[content_key] = (transcription_result, final_segments)
+                    if len(self._result_cache) > self._result_cache_size:
+                        self._result_cache.popitem(last=False)
             
             # 6. 后处理和保存
             processed_segments = self._post_process_offline_segments(
@@ -127,14 +167,14 @@ class OfflineAudioProcessor:
                 recording_id, processed_segments, transcription_result
             )
             
-            logger.info(f"录音 {recording_id} 离线重新处理完成")
+            logger.info("录音 %s 离线重新处理完成, 总耗时 %.2f秒", recording_id, time.perf_counter() - start_time)
             
             return {
                 "success": True,
                 "message": "离线重新处理完成",
                 "segments_count": len(processed_segments),
                 "processing_info": {
-                    "used_whisper": self.whisper_model is not None,
+                    "used_whisper": False,  # 转写使用SenseVoice
                     "used_cam_plus": True,  # 使用CAM++说话人识别
                     "total_duration": transcription_result.get("duration", 0)
                 }
@@ -166,41 +206,60 @@ class OfflineAudioProcessor:
             audio_data = None
             sr = None
             
-            # 方法1: 使用librosa加载音频
+            # soundfile不一定能解码的格式，提前并行启动FFmpeg解码，失败回退时无需再从头等待
+            ffmpeg_task = None
+            if os.path.splitext(file_path)[1].lower() not in self._SOUNDFILE_EXTENSIONS:
+                ffmpeg_task = asyncio.create_task(self._convert_audio_with_ffmpeg(file_path))
+            
+            # 方法1: 使用soundfile直接读取float32数据（比librosa快得多）
             try:
-                logger.info("使用librosa加载音频...")
-                audio_data, sr = librosa.load(file_path, sr=self.sample_rate, mono=True)
-                logger.info(f"librosa加载成功: 原始采样率={sr}, 音频长度={len(audio_data)}")
-            except Exception as librosa_error:
-                logger.warning(f"librosa加载失败: {librosa_error}")
+                logger.info("使用soundfile加载音频...")
+                if not SOUNDFILE_AVAILABLE:
+                    raise ImportError("soundfile不可用")
+                audio_data, sr = await asyncio.to_thread(sf.read, file_path, dtype='float32')
+                
+                # 转换为单声道
+                if audio_data.ndim > 1:
+                    audio_data = audio_data.mean(axis=1, dtype=np.float32)
                 
-                # 方法2: 使用soundfile
+                # 重采样到目标采样率（如果需要），多相滤波比FFT重采样更快且不分配整段频谱
+                if sr != self.sample_rate:
+                    from math import gcd
+                    from scipy.signal import resample_poly
+                    factor = gcd(int(sr), self.sample_rate)
+                    audio_data = resample_poly(audio_data, self.sample_rate // factor, int(sr) // factor).astype(np.float32, copy=False)
+                    sr = self.sample_rate
+                
+                logger.info(f"soundfile加载成功: 采样率={sr}, 音频长度={len(audio_data)}")
+            except Exception as sf_error:
+                logger.warning(f"soundfile加载失败: {sf_error}")
+                
+                # 方法2: 使用librosa加载音频（支持soundfile无法解码的格式）
                 try:
-                    logger.info("尝试使用soundfile...")
-                    if not SOUNDFILE_AVAILABLE:
-                        raise ImportError("soundfile不可用")
-                    audio_data, sr = sf.read(file_path)
-                    
-                    # 转换为单声道
-                    if audio_data.ndim > 1:
-                        audio_data = np.mean(audio_data, axis=1)
-                    
-                    # 重采样到目标采样率（如果需要）
-                    if sr != self.sample_rate:
-                        from scipy.signal import resample
-                        target_length = int(len(audio_data) * self.sample_rate / sr)
-                        audio_data = resample(audio_data, target_length)
-                        sr = self.sample_rate
+                    ffmpeg_audio = ffmpeg_sr = None
+                    if ffmpeg_task is not None:
+                        # 这些格式librosa同样要经audioread调用FFmpeg且更慢，先等待已在后台进行的FFmpeg解码
+                        ffmpeg_audio, ffmpeg_sr = await ffmpeg_task
                     
-                    logger.info(f"soundfile加载成功: 采样率={sr}, 音频长度={len(audio_data)}")
+                    if ffmpeg_audio is not None:
+                        audio_data, sr = ffmpeg_audio, ffmpeg_sr
+                        logger.info(f"FFmpeg转换成功: 采样率={sr}, 音频长度={len(audio_data)}")
+                    else:
+                        # FFmpeg不可用或解码失败时仍交给librosa/audioread尝试
+                        logger.info("尝试使用librosa...")
+                        audio_data, sr = await asyncio.to_thread(librosa.load, file_path, sr=self.sample_rate, mono=True)
+                        logger.info(f"librosa加载成功: 原始采样率={sr}, 音频长度={len(audio_data)}")
                     
-                except Exception as sf_error:
-                    logger.warning(f"soundfile也加载失败: {sf_error}")
+                except Exception as librosa_error:
+                    logger.warning(f"librosa也加载失败: {librosa_error}")
                     
                     # 方法3: 尝试用FFmpeg转换后再加载
                     try:
-                        logger.info("尝试使用FFmpeg转换音频...")
-                        audio_data, sr = await self._convert_audio_with_ffmpeg(file_path)
+                        if ffmpeg_task is None:
+                            logger.info("尝试使用FFmpeg转换音频...")
+                            ffmpeg_task = asyncio.create_task(self._convert_audio_with_ffmpeg(file_path))
+                        # 预先启动的解码已在上面完成时直接取回其结果
+                        audio_data, sr = await ffmpeg_task
                         if audio_data is not None:
                             logger.info(f"FFmpeg转换成功: 采样率={sr}, 音频长度={len(audio_data)}")
                     except Exception as ffmpeg_error:
@@ -222,6 +281,14 @@ class OfflineAudioProcessor:
                             logger.error(f"文件检查失败: {file_error}")
                             return None
             
+            # 前面的方法已成功时取消预先启动的FFmpeg解码
+            if ffmpeg_task is not None and not ffmpeg_task.done():
+                ffmpeg_task.cancel()
+                try:
+                    await ffmpeg_task
+                except asyncio.CancelledError:
+                    pass
+            
             # 检查是否成功加载音频
             if audio_data is None:
                 logger.error("所有音频加载方法都失败了")
@@ -232,18 +299,21 @@ class OfflineAudioProcessor:
                 logger.error("加载的音频数据为空")
                 return None
             
-            # 5. 音频数据类型转换
-            if audio_data.dtype != np.float32:
-                audio_data = audio_data.astype(np.float32)
-            
-            # 6. 音频标准化（防止溢出）
-            max_val = np.max(np.abs(audio_data))
+            # 5-6. 数据类型转换与音频标准化（防止溢出）合并为一次遍历：
+            # 两次无分配的归约求峰值，float32数据原地缩放，其他类型在缩放时直接输出float32
+            max_val = max(float(audio_data.max()), -float(audio_data.min()))
             if max_val > 0:
-                audio_data = audio_data / max_val * 0.95  # 稍微降低音量避免削波
+                scale = np.float32(0.95 / max_val)  # 稍微降低音量避免削波
+                if audio_data.dtype == np.float32 and audio_data.flags.writeable:
+                    np.multiply(audio_data, scale, out=audio_data)
+                else:
+                    audio_data = np.multiply(audio_data, scale, dtype=np.float32)
+            elif audio_data.dtype != np.float32:
+                audio_data = audio_data.astype(np.float32)
             
             # 7. 检查音频时长
             duration = len(audio_data) / sr
-            logger.info(f"音频预处理完成: 时长={duration:.2f}秒, 采样率={sr}, 数据类型={audio_data.dtype}")
+            logger.info("音频预处理完成: 时长=%.2f秒, 采样率=%d, 数据类型=%s", duration, sr, audio_data.dtype)
             
             if duration < 0.1:
                 logger.warning("音频时长过短，可能影响处理效果")
@@ -259,43 +329,41 @@ class OfflineAudioProcessor:
     async def _offline_transcribe(self, audio_data: np.ndarray, file_path: str) -> Dict[str, Any]:
         """离线语音识别 - 使用SenseVoice高精度模式"""
         try:
-            logger.info("使用SenseVoice离线高精度转写...")
-            
             # 使用SenseVoice进行高精度转写
             # 更小的分段，更高精度的处理
             segment_duration = 15.0  # 15秒一段，提高精度
             segment_samples = int(segment_duration * self.sample_rate)
             
-            all_segments = []
-            current_time = 0.0
-            
+            # 先切分全部片段（跳过结尾太短的片段）
+            chunks = []
             for i in range(0, len(audio_data), segment_samples):
                 chunk = audio_data[i:i + segment_samples]
-                chunk_duration = len(chunk) / self.sample_rate
-                
-                if len(chunk) < self.sample_rate * 0.5:  # 跳过太短的片段
+                if len(chunk) < self.sample_rate * 0.5:
                     break
+                chunks.append((i / self.sample_rate, chunk))
+            
+            # 每批片段一次模型调用（启用ITN）；逐批执行且不经过实时会话共用的ASR队列，避免长录音阻塞实时识别
+            asr_results = []
+            batch_size = processing_config.ASR_BATCH_CHUNKS
+            for i in range(0, len(chunks), batch_size):
+                asr_results.extend(await asr_async_batch([chunk for _, chunk in chunks[i:i + batch_size]], "zh", True))
+            
+            all_segments = []
+            for (chunk_start, chunk), asr_result in zip(chunks, asr_results):
+                chunk_duration = len(chunk) / self.sample_rate
                 
-                # 使用现有的ASR模型进行转写，启用高精度选项
-                cache_asr = {}
-                asr_result = await asr_async(chunk, "zh", cache_asr, True)  # 启用ITN
-                
-                if asr_result and len(asr_result) > 0:
+                if asr_result:
                     # 提取文本内容，去除SenseVoice的特殊标记
-                    import re
-                    text_content = asr_result[0].get("text", "")
-                    text_content = re.sub(r'<\|[^|]+\|>', '', text_content).strip()
+                    text_content = asr_result.get("text", "")
+                    text_content = _SENSEVOICE_TAG_RE.sub('', text_content).strip()
                     
                     if text_content:
                         all_segments.append({
-                            "start": current_time,
-                            "end": current_time + chunk_duration,
+                            "start": chunk_start,
+                            "end": chunk_start + chunk_duration,
                             "text": text_content,
-                            "confidence": abs(asr_result[0].get("avg_logprob", 0.8)),
-                            "words": []  # SenseVoice暂不支持词级时间戳
-                        })
-                
-                current_time += chunk_duration
+                            "confidence": abs(asr_result.get("avg_logprob", 0.8))
+                        })  # SenseVoice暂不支持词级时间戳，段落不带words字段
             
             # 合并连续的短段落
             merged_segments = self._merge_short_segments(all_segments)
@@ -311,7 +379,7 @@ class OfflineAudioProcessor:
             
         except Exception as e:
             logger.error(f"SenseVoice离线转写失败: {e}")
-            return await self._fallback_transcribe(file_path)
+            return await self._fallback_transcribe(file_path, audio_data)
     
     async def _offline_speaker_diarization(
         self, 
@@ -321,8 +389,6 @@ class OfflineAudioProcessor:
     ) -> List[Dict[str, Any]]:
         """离线说话人分离 - 使用CAM++模型和智能算法"""
         try:
-            logger.info("使用CAM++模型进行离线说话人分离...")
-            
             segments = transcription_result.get("segments", [])
             if not segments:
                 return []
@@ -332,8 +398,6 @@ class OfflineAudioProcessor:
                 audio_data, segments, file_path
             )
             
-            logger.info(f"说话人分离完成，检测到 {len(set(seg['speaker'] for seg in speaker_segments))} 个说话人")
-            
             return speaker_segments
             
         except Exception as e:
@@ -348,34 +412,66 @@ class OfflineAudioProcessor:
     ) -> List[Dict[str, Any]]:
         """基于CAM++模型的智能说话人分离"""
         try:
-            logger.info("开始CAM++智能说话人分离...")
-            
             speaker_segments = []
             speaker_embeddings = {}  # 存储说话人特征
             current_speaker_id = 0
-            
-            for segment in text_segments:
+            known_speaker_ids = {"SPEAKER_00"}  # 已分配的说话人ID，与current_speaker_id同步维护
+            last_speaker_id = "SPEAKER_00"
+            
+            # 批量计算段落的采样点范围，切片均为零拷贝视图
+            start_samples = (np.array([seg["start"] for seg in text_segments], dtype=np.float64) * self.sample_rate).astype(np.int64)
+            end_samples = (np.array([seg["end"] for seg in text_segments], dtype=np.float64) * self.sample_rate).astype(np.int64)
+            segment_audios = [audio_data[s:e] for s, e in zip(start_samples, end_samples)]
+            min_samples = int(self.sample_rate * self._MIN_EMBEDDING_SECONDS)
+            
+            # 各段落的声纹嵌入互不依赖，先分批提取（每批一次线程池调用，不占满共享线程池而阻塞实时会话），说话人判定仍按时间顺序进行
+            long_indices = [i for i, seg_audio in enumerate(segment_audios) if len(seg_audio) >= min_samples]
+            embeddings = {}
+            batch_size = processing_config.SPEAKER_EMBEDDING_BATCH
+            for batch_start in range(0, len(long_indices), batch_size):
+                batch_indices = long_indices[batch_start:batch_start + batch_size]
+                try:
+                    batch_embeddings = await async_sv_embedding_batch([segment_audios[i] for i in batch_indices])
+                except Exception as e:
+                    # 本批段落在识别时逐段提取
+                    logger.warning(f"批量提取声纹嵌入失败: {e}")
+                    continue
+                embeddings.update(zip(batch_indices, batch_embeddings))
+            
+            # 特征回退需要MFCC时，对整段音频只计算一次，各段落按帧切片取均值
+            mfcc_frames = None
+            hop_length = 512  # librosa默认帧移
+            
+            def segment_mfcc(start_sample: int, end_sample: int) -> np.ndarray:
+                nonlocal mfcc_frames
+                if mfcc_frames is None:
+                    mfcc_frames = self._compute_mfcc(audio_data, hop_length=hop_length)
+                start_frame = start_sample // hop_length
+                end_frame = max(start_frame + 1, -(-end_sample // hop_length))
+                return mfcc_frames[:, start_frame:end_frame].mean(axis=1)
+            
+            for index, segment in enumerate(text_segments):
                 start_time = segment["start"]
                 end_time = segment["end"]
+                segment_audio = segment_audios[index]
                 
-                # 提取段落音频
-                start_sample = int(start_time * self.sample_rate)
-                end_sample = int(end_time * self.sample_rate)
-                segment_audio = audio_data[start_sample:end_sample]
-                
-                if len(segment_audio) < self.sample_rate * 0.5:  # 至少0.5秒
-                    # 太短的段落，分配给前一个说话人或新说话人
-                    speaker_id = f"SPEAKER_{current_speaker_id:02d}"
+                if len(segment_audio) < min_samples:
+                    # 太短的段落声纹不可靠，不调用模型，直接沿用上一个段落的说话人
+                    speaker_id = last_speaker_id
                 else:
                     # 使用现有的说话人识别系统进行特征提取和比较
                     speaker_id = await self._identify_speaker_with_cam_plus(
-                        segment_audio, speaker_embeddings, current_speaker_id
+                        segment_audio, speaker_embeddings, current_speaker_id,
+                        embedding=embeddings.get(index),
+                        mfcc_provider=functools.partial(segment_mfcc, int(start_samples[index]), int(end_samples[index]))
                     )
                     
                     # 如果是新说话人，更新计数器
-                    if speaker_id not in [f"SPEAKER_{i:02d}" for i in range(current_speaker_id + 1)]:
+                    if speaker_id not in known_speaker_ids:
                         current_speaker_id += 1
+                        known_speaker_ids.add(f"SPEAKER_{current_speaker_id:02d}")
                 
+                last_speaker_id = speaker_id
                 speaker_segments.append({
                     "start": start_time,
                     "end": end_time,
@@ -396,9 +492,11 @@ class OfflineAudioProcessor:
         self,
         segment_audio: np.ndarray,
         speaker_embeddings: Dict[str, Any],
-        current_speaker_id: int
+        current_speaker_id: int,
+        embedding: Optional[np.ndarray] = None,
+        mfcc_provider: Optional[Callable[[], np.ndarray]] = None
     ) -> str:
-        """使用CAM++模型识别说话人"""
+        """使用CAM++模型识别说话人（可传入预先提取的声纹嵌入）"""
         try:
             # 准备说话人识别参数
             speaker_gallery = speaker_embeddings.get("gallery", {})
@@ -414,7 +512,8 @@ class OfflineAudioProcessor:
                 speaker_counter,
                 sv_thr,
                 speaker_history,
-                current_speaker
+                current_speaker,
+                embedding=embedding
             )
             
             # 更新speaker_embeddings
@@ -428,128 +527,211 @@ class OfflineAudioProcessor:
         except Exception as e:
             logger.warning(f"CAM++识别失败，使用特征分析: {e}")
             return await self._audio_feature_based_identification(
-                segment_audio, speaker_embeddings, current_speaker_id
+                segment_audio, speaker_embeddings, current_speaker_id, mfcc_provider
             )
 
     async def _audio_feature_based_identification(
         self,
         segment_audio: np.ndarray,
         speaker_embeddings: Dict[str, Any],
-        current_speaker_id: int
+        current_speaker_id: int,
+        mfcc_provider: Optional[Callable[[], np.ndarray]] = None
     ) -> str:
         """基于音频特征的说话人识别"""
         try:
-            # 提取基本音频特征
-            # 1. 平均音量
-            volume = np.mean(np.abs(segment_audio))
-            
-            # 2. 音调特征（基频）
-            pitch = self._estimate_pitch(segment_audio)
-            
-            # 3. 语谱特征
-            mfcc_features = self._extract_simple_mfcc(segment_audio)
-            
-            current_features = {
-                "volume": volume,
-                "pitch": pitch,
-                "mfcc": mfcc_features
-            }
+            current_features = self._extract_segment_features(segment_audio, mfcc_provider)
             
-            # 与已有说话人比较
-            best_match = None
-            best_similarity = 0.3  # 相似度阈值
-            
-            for speaker_id, stored_features in speaker_embeddings.items():
-                similarity = self._calculate_feature_similarity(current_features, stored_features)
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = speaker_id
-            
-            if best_match:
-                return best_match
-            else:
-                # 新说话人
-                new_speaker_id = f"SPEAKER_{current_speaker_id:02d}"
-                speaker_embeddings[new_speaker_id] = current_features
-                return new_speaker_id
+            # 与已有说话人一次性比较（speaker_embeddings中还保存了CAM++状态，只取特征条目）
+            stored_ids = [
+                speaker_id for speaker_id, stored_features in speaker_embeddings.items()
+                if isinstance(stored_features, dict) and "mfcc" in stored_features
+            ]
+            if stored_ids:
+                similarities = self._calculate_feature_similarity_batch(
+                    current_features, [speaker_embeddings[speaker_id] for speaker_id in stored_ids]
+                )
+                best_index = int(similarities.argmax())
+                if similarities[best_index] > 0.3:  # 相似度阈值
+                    return stored_ids[best_index]
+            
+            # 新说话人
+            new_speaker_id = f"SPEAKER_{current_speaker_id:02d}"
+            speaker_embeddings[new_speaker_id] = current_features
+            return new_speaker_id
                 
         except Exception as e:
             logger.error(f"特征识别失败: {e}")
             return f"SPEAKER_{current_speaker_id:02d}"
 
+    def _extract_segment_features(
+        self,
+        segment_audio: np.ndarray,
+        mfcc_provider: Optional[Callable[[], np.ndarray]] = None
+    ) -> Dict[str, Any]:
+        """提取片段的音量、基频和MFCC特征（按音频内容缓存，mfcc_provider可提供整段预计算的MFCC）"""
+        key = hashlib.md5(np.ascontiguousarray(segment_audio).tobytes()).hexdigest()
+        cached = self._feature_cache.get(key)
+        if cached is not None:
+            self._feature_cache.move_to_end(key)
+            return cached
+        
+        # 提取基本音频特征
+        features = {
+            "volume": np.mean(np.abs(segment_audio)),  # 1. 平均音量
+            "pitch": self._estimate_pitch(segment_audio),  # 2. 音调特征（基频）
+            "mfcc": mfcc_provider() if mfcc_provider else self._extract_simple_mfcc(segment_audio)  # 3. 语谱特征
+        }
+        # 预先计算去均值MFCC及其范数，相似度计算时只需一次点积
+        features["mfcc_centered"], features["mfcc_norm"] = self._center_mfcc(features["mfcc"])
+        
+        self._feature_cache[key] = features
+        if len(self._feature_cache) > self._feature_cache_size:
+            self._feature_cache.popitem(last=False)
+        return features
+
     def _estimate_pitch(self, audio: np.ndarray) -> float:
-        """估算基频"""
+        """估算基频（整段FFT自相关，搜索50-500Hz对应的延迟）"""
         try:
-            # 使用librosa估算基频
-            pitches, magnitudes = librosa.piptrack(
-                y=audio, sr=self.sample_rate, threshold=0.1
-            )
-            pitch_values = []
-            for t in range(pitches.shape[1]):
-                index = magnitudes[:, t].argmax()
-                pitch = pitches[index, t]
-                if pitch > 0:
-                    pitch_values.append(pitch)
-            
-            return np.mean(pitch_values) if pitch_values else 0.0
+            min_lag = self.sample_rate // 500
+            max_lag = self.sample_rate // 50
+            if len(audio) <= max_lag:
+                return 0.0
+            
+            x = audio - audio.mean()
+            n_fft = 1 << (2 * len(x) - 1).bit_length()
+            spectrum = np.fft.rfft(x, n=n_fft)
+            acf = np.fft.irfft(spectrum * np.conj(spectrum), n=n_fft)[:max_lag + 1]
+            if acf[0] <= 0:
+                return 0.0
+            
+            lag = int(acf[min_lag:max_lag + 1].argmax()) + min_lag
+            return float(self.sample_rate / lag)
         except:
             return 0.0
 
     def _extract_simple_mfcc(self, audio: np.ndarray) -> np.ndarray:
         """提取简单的MFCC特征"""
         try:
-            mfcc = librosa.feature.mfcc(
-                y=audio, sr=self.sample_rate, n_mfcc=13
-            )
+            mfcc = self._compute_mfcc(audio)
             return np.mean(mfcc, axis=1)
         except:
             return np.zeros(13)
 
+    def _compute_mfcc(
+        self,
+        audio: np.ndarray,
+        n_mfcc: int = 13,
+        n_fft: int = 2048,
+        hop_length: int = 512,
+        block_frames: int = 4096
+    ) -> np.ndarray:
+        """
+        计算MFCC帧矩阵 (n_mfcc, n_frames)，参数与librosa.feature.mfcc默认值一致
+        
+        分帧使用stride视图（零拷贝），FFT使用scipy.fft多线程批量计算；
+        按块处理帧，避免长录音一次性展开全部加窗帧占用过多内存。
+        """
+        if self._mel_basis is None:
+            self._mel_basis = librosa.filters.mel(sr=self.sample_rate, n_fft=n_fft, n_mels=128).astype(np.float32)
+            # 周期汉宁窗（与librosa的"hann"一致）
+            self._mfcc_window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+        
+        # 居中分帧：两端各补n_fft//2个零，帧数为 1 + len(audio) // hop_length
+        padded = np.pad(np.asarray(audio, dtype=np.float32), n_fft // 2)
+        frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop_length]
+        
+        # 功率谱 -> 梅尔谱，结果形状 (n_frames, n_mels)
+        mel_blocks = []
+        for start in range(0, len(frames), block_frames):
+            spectrum = sp_fft.rfft(frames[start:start + block_frames] * self._mfcc_window, axis=1, workers=-1)
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+            mel_blocks.append(power @ self._mel_basis.T)
+        mel_spec = np.concatenate(mel_blocks)
+        
+        # power_to_db（ref=1.0, amin=1e-10, top_db=80）后做正交DCT-II
+        log_mel = 10.0 * np.log10(np.maximum(mel_spec, 1e-10))
+        log_mel = np.maximum(log_mel, log_mel.max() - 80.0)
+        return sp_fft.dct(log_mel, type=2, axis=1, norm="ortho")[:, :n_mfcc].T
+
     def _calculate_feature_similarity(self, features1: Dict, features2: Dict) -> float:
         """计算特征相似度"""
         try:
-            # 音量相似度
-            volume_sim = 1.0 - abs(features1["volume"] - features2["volume"]) / max(features1["volume"], features2["volume"], 0.01)
-            
-            # 音调相似度
-            pitch_sim = 1.0 - abs(features1["pitch"] - features2["pitch"]) / max(features1["pitch"], features2["pitch"], 100.0)
-            
-            # MFCC相似度
-            mfcc_sim = np.corrcoef(features1["mfcc"], features2["mfcc"])[0, 1]
-            if np.isnan(mfcc_sim):
-                mfcc_sim = 0.0
-            
-            # 加权平均
-            total_sim = (volume_sim * 0.3 + pitch_sim * 0.3 + mfcc_sim * 0.4)
-            return max(0.0, total_sim)
+            return float(self._calculate_feature_similarity_batch(features1, [features2])[0])
         except:
             return 0.0
 
+    @staticmethod
+    def _center_mfcc(mfcc: np.ndarray) -> tuple[np.ndarray, float]:
+        """MFCC去均值并返回其L2范数"""
+        centered = np.asarray(mfcc, dtype=np.float64)
+        centered = centered - centered.mean()
+        return centered, float(np.linalg.norm(centered))
+
+    def _calculate_feature_similarity_batch(self, features: Dict, stored_features: List[Dict]) -> np.ndarray:
+        """向量化计算一个特征与多个已有说话人特征的相似度"""
+        volumes = np.array([f["volume"] for f in stored_features], dtype=np.float64)
+        pitches = np.array([f["pitch"] for f in stored_features], dtype=np.float64)
+        centered_pairs = [
+            (f["mfcc_centered"], f["mfcc_norm"]) if "mfcc_centered" in f else self._center_mfcc(f["mfcc"])
+            for f in stored_features
+        ]
+        stored_centered = np.array([pair[0] for pair in centered_pairs])
+        stored_norms = np.array([pair[1] for pair in centered_pairs])
+        
+        # 音量相似度
+        volume_sim = 1.0 - np.abs(features["volume"] - volumes) / np.maximum(np.maximum(volumes, features["volume"]), 0.01)
+        
+        # 音调相似度
+        pitch_sim = 1.0 - np.abs(features["pitch"] - pitches) / np.maximum(np.maximum(pitches, features["pitch"]), 100.0)
+        
+        # MFCC相似度（Pearson相关系数 = 去均值向量的归一化点积，去均值结果和范数已缓存）
+        if "mfcc_centered" in features:
+            centered, norm = features["mfcc_centered"], features["mfcc_norm"]
+        else:
+            centered, norm = self._center_mfcc(features["mfcc"])
+        denom = stored_norms * norm
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mfcc_sim = (stored_centered @ centered) / denom
+        mfcc_sim = np.nan_to_num(mfcc_sim, nan=0.0, posinf=0.0, neginf=0.0)
+        
+        # 加权平均
+        total_sim = volume_sim * 0.3 + pitch_sim * 0.3 + mfcc_sim * 0.4
+        return np.maximum(total_sim, 0.0)
+
     async def _convert_audio_with_ffmpeg(self, file_path: str) -> tuple[np.ndarray, int]:
-        """使用FFmpeg转换音频"""
+        """使用FFmpeg转换音频（PCM直接从管道读取，不落盘）"""
         try:
-            import subprocess
-            temp_file = file_path + ".converted.wav"
-            
-            # 使用FFmpeg转换为标准WAV格式
+            # 使用FFmpeg解码为16位单声道PCM并输出到stdout
             cmd = [
                 "ffmpeg", "-i", file_path, 
                 "-ar", str(self.sample_rate),  # 采样率
                 "-ac", "1",  # 单声道
-                "-f", "wav",  # WAV格式
-                "-y",  # 覆盖输出文件
-                temp_file
+                "-f", "s16le", "-acodec", "pcm_s16le",  # 原始PCM
+                "-loglevel", "error",
+                "pipe:1"
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0 and os.path.exists(temp_file):
-                # 使用librosa加载转换后的文件
-                audio_data, sr = librosa.load(temp_file, sr=self.sample_rate, mono=True)
-                os.remove(temp_file)  # 清理临时文件
-                return audio_data, sr
+            process = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                raw_audio, stderr = await asyncio.wait_for(process.communicate(), timeout=30)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                logger.error("FFmpeg转换超时")
+                return None, None
+            except asyncio.CancelledError:
+                # 预先启动的解码不再需要时结束并回收FFmpeg进程
+                process.kill()
+                await process.wait()
+                raise
+            
+            if process.returncode == 0 and raw_audio:
+                audio_data = np.multiply(np.frombuffer(raw_audio, dtype=np.int16), np.float32(1.0 / 32768.0), dtype=np.float32)
+                return audio_data, self.sample_rate
             else:
-                logger.error(f"FFmpeg转换失败: {result.stderr}")
+                logger.error(f"FFmpeg转换失败: {stderr.decode(errors='ignore')}")
                 return None, None
                 
         except Exception as e:
@@ -652,13 +834,14 @@ class OfflineAudioProcessor:
         
         return merged
 
-    async def _fallback_transcribe(self, file_path: str) -> Dict[str, Any]:
-        """降级转写方案 - 使用SenseVoice"""
+    async def _fallback_transcribe(self, file_path: str, audio_data: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """降级转写方案 - 使用SenseVoice（已预处理的音频可直接传入，避免重复加载）"""
         try:
             logger.info("使用SenseVoice降级转写方案...")
             
-            # 1. 尝试预处理音频
-            audio_data = await self._preprocess_audio(file_path)
+            # 1. 未传入音频时才预处理
+            if audio_data is None:
+                audio_data = await self._preprocess_audio(file_path)
             if audio_data is None:
                 logger.error("音频预处理失败，使用演示转写内容")
                 return self._get_demo_transcription()
@@ -737,27 +920,24 @@ class OfflineAudioProcessor:
             
             # 基于停顿检测的简单说话人分离
             segments = transcription_result.get("segments", [])
-            speaker_segments = []
+            if not segments:
+                return []
             
-            current_speaker = "SPEAKER_00"
-            speaker_count = 0
+            # 简单规则：如果停顿超过2秒，可能是新说话人（最多3个说话人轮换），一次向量化算出全部说话人编号
+            starts = np.fromiter((seg["start"] for seg in segments), dtype=np.float64, count=len(segments))
+            ends = np.fromiter((seg["end"] for seg in segments), dtype=np.float64, count=len(segments))
+            speaker_changes = (starts[1:] - ends[:-1]) > 2.0  # 2秒停顿
+            speaker_indices = np.concatenate(([0], np.cumsum(speaker_changes))) % 3
             
-            for i, segment in enumerate(segments):
-                # 简单规则：如果停顿超过2秒，可能是新说话人
-                if i > 0:
-                    prev_end = segments[i-1]["end"]
-                    current_start = segment["start"]
-                    
-                    if current_start - prev_end > 2.0:  # 2秒停顿
-                        speaker_count = (speaker_count + 1) % 3  # 最多3个说话人
-                        current_speaker = f"SPEAKER_{speaker_count:02d}"
-                
-                speaker_segments.append({
+            speaker_segments = [
+                {
                     "start": segment["start"],
                     "end": segment["end"],
-                    "speaker": current_speaker,
+                    "speaker": f"SPEAKER_{speaker_index:02d}",
                     "confidence": 0.6
-                })
+                }
+                for segment, speaker_index in zip(segments, speaker_indices.tolist())
+            ]
             
             return speaker_segments
             
@@ -780,44 +960,24 @@ class OfflineAudioProcessor:
                     segment["speaker"] = "SPEAKER_00"
                 return transcription_segments
             
-            # 为每个转写段落匹配说话人
-            merged_segments = []
+            # 转写段落与说话人段落的重叠矩阵一次广播计算，每行取重叠最大的说话人
+            trans_starts = np.fromiter((seg["start"] for seg in transcription_segments), dtype=np.float64, count=len(transcription_segments))
+            trans_ends = np.fromiter((seg["end"] for seg in transcription_segments), dtype=np.float64, count=len(transcription_segments))
+            spk_starts = np.fromiter((seg["start"] for seg in speaker_segments), dtype=np.float64, count=len(speaker_segments))
+            spk_ends = np.fromiter((seg["end"] for seg in speaker_segments), dtype=np.float64, count=len(speaker_segments))
+            spk_ids = [seg["speaker"] for seg in speaker_segments]
             
-            for trans_seg in transcription_segments:
-                trans_start = trans_seg["start"]
-                trans_end = trans_seg["end"]
-                trans_mid = (trans_start + trans_end) / 2
-                
-                # 找到时间重叠最大的说话人段落
-                best_speaker = "SPEAKER_00"
-                max_overlap = 0
-                
-                for spk_seg in speaker_segments:
-                    spk_start = spk_seg["start"]
-                    spk_end = spk_seg["end"]
-                    
-                    # 计算重叠时间
-                    overlap_start = max(trans_start, spk_start)
-                    overlap_end = min(trans_end, spk_end)
-                    overlap = max(0, overlap_end - overlap_start)
-                    
-                    if overlap > max_overlap:
-                        max_overlap = overlap
-                        best_speaker = spk_seg["speaker"]
-                
-                # 创建合并后的段落
-                merged_segment = {
-                    "start": trans_start,
-                    "end": trans_end,
-                    "text": trans_seg["text"],
-                    "speaker": best_speaker,
-                    "confidence": trans_seg.get("confidence", 0.8),
-                    "words": trans_seg.get("words", [])
-                }
-                
-                merged_segments.append(merged_segment)
+            overlaps = np.minimum(trans_ends[:, None], spk_ends[None, :]) - np.maximum(trans_starts[:, None], spk_starts[None, :])
+            best_indices = overlaps.argmax(axis=1)
+            has_overlap = overlaps[np.arange(len(best_indices)), best_indices] > 0
             
-            return merged_segments
+            # 直接在转写段落上补充说话人和默认置信度，不再为每个段落复制一份新字典
+            for trans_seg, best_index, overlapped in zip(transcription_segments, best_indices.tolist(), has_overlap.tolist()):
+                # 无重叠时使用默认说话人
+                trans_seg["speaker"] = spk_ids[best_index] if overlapped else "SPEAKER_00"
+                trans_seg.setdefault("confidence", 0.8)
+            
+            return transcription_segments
             
         except Exception as e:
             logger.error(f"合并转写和说话人信息失败: {e}")
@@ -830,32 +990,34 @@ class OfflineAudioProcessor:
     ) -> List[Dict[str, Any]]:
         """后处理离线段落"""
         try:
-            processed_segments = []
-            speaker_names = {}
             speaker_colors = ["#1890ff", "#52c41a", "#fa8c16", "#eb2f96", "#722ed1"]
+            smart_punctuation = options.get("smart_punctuation", True)
+            number_conversion = options.get("number_conversion", True)
             
+            # 按首次出现顺序为说话人分配名称和颜色，每个说话人只计算一次
+            speaker_styles = {}
             for segment in segments:
-                # 分配说话人名称和颜色
                 speaker_id = segment["speaker"]
-                if speaker_id not in speaker_names:
-                    speaker_index = len(speaker_names) + 1
-                    speaker_names[speaker_id] = f"发言人{speaker_index}"
-                
-                speaker_name = speaker_names[speaker_id]
-                color_index = (len(speaker_names) - 1) % len(speaker_colors)
-                speaker_color = speaker_colors[color_index]
+                if speaker_id not in speaker_styles:
+                    speaker_index = len(speaker_styles)
+                    speaker_styles[speaker_id] = (f"发言人{speaker_index + 1}", speaker_colors[speaker_index % len(speaker_colors)])
+            
+            processed_segments = []
+            for segment in segments:
+                speaker_id = segment["speaker"]
+                speaker_name, speaker_color = speaker_styles[speaker_id]
                 
                 # 文本后处理
                 content = segment["text"].strip()
                 
                 # 应用处理选项
-                if options.get("smart_punctuation", True):
+                if smart_punctuation:
                     content = self._add_smart_punctuation(content)
                 
-                if options.get("number_conversion", True):
+                if number_conversion:
                     content = self._convert_numbers(content)
                 
-                processed_segment = {
+                processed_segments.append({
                     "speakerId": speaker_id,
                     "speakerName": speaker_name,
                     "speakerColor": speaker_color,
@@ -864,9 +1026,7 @@ class OfflineAudioProcessor:
                     "endTime": segment["end"],
                     "confidence": segment["confidence"],
                     "offline_processed": True  # 标记为离线处理
-                }
-                
-                processed_segments.append(processed_segment)
+                })
             
             return processed_segments
             
@@ -878,22 +1038,13 @@ class OfflineAudioProcessor:
         """智能标点符号"""
         # 简单实现，可以使用更复杂的NLP模型
         text = text.strip()
-        if text and not text[-1] in '。！？；':
+        if text and text[-1] not in self._SENTENCE_END_PUNCTUATION:
             text += '。'
         return text
     
     def _convert_numbers(self, text: str) -> str:
-        """数字转换"""
-        # 简单的数字转换
-        replacements = {
-            "一": "1", "二": "2", "三": "3", "四": "4", "五": "5",
-            "六": "6", "七": "7", "八": "8", "九": "9", "十": "10"
-        }
-        
-        for chinese, arabic in replacements.items():
-            text = text.replace(chinese, arabic)
-        
-        return text
+        """数字转换（单次translate完成全部替换）"""
+        return text.translate(self._NUMBER_TRANSLATION)
     
     async def _update_recording_with_offline_results(
         self,
@@ -903,25 +1054,19 @@ class OfflineAudioProcessor:
     ):
         """更新数据库中的离线处理结果"""
         try:
-            # 保存新的段落（替换实时转写结果）
-            db_manager.save_segments(recording_id, processed_segments)
-            
             # 重新生成摘要（基于更准确的转写）
-            full_text = " ".join([seg["content"] for seg in processed_segments])
+            full_text = " ".join(seg["content"] for seg in processed_segments)
             
-            # 可以调用AI服务重新生成摘要
-            from ai_service import ai_service
-            summary_result = await ai_service.generate_summary(full_text, "meeting")
-            if summary_result:
-                db_manager.save_summary(recording_id, summary_result)
-            
-            # 重新提取关键词
-            keywords_result = await ai_service.extract_keywords(full_text, max_keywords=8)
-            if keywords_result:
-                db_manager.save_keywords(recording_id, keywords_result)
+            # 重新生成摘要并提取关键词，两次AI调用互不依赖，并发执行
+            summary_result, keywords_result = await asyncio.gather(
+                ai_service.generate_summary(full_text, "meeting"),
+                ai_service.extract_keywords(full_text, max_keywords=8)
+            )
             
-            # 更新录音状态
-            db_manager.update_recording_status(recording_id, "offline_completed")
+            # 段落（替换实时转写结果）、摘要、关键词和状态在一个事务中写入
+            db_manager.save_offline_results(
+                recording_id, processed_segments, summary_result, keywords_result, "offline_completed"
+            )
             
             logger.info(f"录音 {recording_id} 离线处理结果已更新到数据库")
             
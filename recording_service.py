@@ -3,7 +3,9 @@
 """
 
 import os
+import re
 import uuid
+import hashlib
 import asyncio
 import aiofiles
 import numpy as np
@@ -14,12 +16,13 @@ from loguru import logger
 import tempfile
 import json
 from datetime import datetime
+from collections import OrderedDict
 import signal
 
 from ai_service import ai_service
 from database import db_manager
-from model_service import asr_async
-from speaker_recognition import diarize_speaker_online_improved_async
+from model_service import asr_async, asr_async_batch, async_sv_embedding, async_sv_embedding_batch
+from speaker_recognition import SpeakerGallery, check_audio_quality, diarize_speaker_online_improved_async
 from text_processing import format_str_v3
 from config import (
     audio_config, quality_config, number_config, 
@@ -27,6 +30,37 @@ from config import (
 )
 
 
+# 演示转写文本的一行："发言人: 内容"，兼容半角和全角冒号
+_DEMO_LINE_RE = re.compile(r'([^:：]+?)\s*[:：]\s*(.*)')
+
+# 智能数字转换规则：只转换明确的数字表达，避免过度转换
+_NUMBER_PATTERNS = [
+    (re.compile(pattern), replacement) for pattern, replacement in [
+        # 1. 转换独立的数字词（前后有空格或标点）
+        (r'\b一\b', '1'),
+        (r'\b二\b', '2'),
+        (r'\b三\b', '3'),
+        (r'\b四\b', '4'),
+        (r'\b五\b', '5'),
+        (r'\b六\b', '6'),
+        (r'\b七\b', '7'),
+        (r'\b八\b', '8'),
+        (r'\b九\b', '9'),
+        (r'\b十\b', '10'),
+        # 2. 转换数量表达
+        (r'(\d+)个([小时|分钟|秒钟|天|周|月|年])', r'\1\2'),
+        # 3. 转换序数表达
+        (r'第一', '第1'),
+        (r'第二', '第2'),
+        (r'第三', '第3'),
+        (r'第四', '第4'),
+        (r'第五', '第5'),
+    ]
+]
+# 上述规则都至少包含其中一个字符，不含这些字符的文本无需逐条匹配
+_NUMBER_HINT_RE = re.compile(r'[一二三四五六七八九十个]')
+
+
 class RecordingProcessor:
     """录音处理器"""
     
@@ -37,12 +71,45 @@ class RecordingProcessor:
         # 发言人颜色映射
         self.speaker_colors = ui_config.SPEAKER_COLORS
         
+        # 片段有效性检查复用的float32缓冲区，按需扩容
+        self._chunk_scratch = np.empty(0, dtype=np.float32)
+        
+        # 音频信息缓存：(文件路径, 修改时间) -> 音频信息
+        self._audio_info_cache: "OrderedDict[Tuple[str, float], Dict[str, Any]]" = OrderedDict()
+        
+        # 声纹嵌入缓存：音频内容指纹 -> 归一化嵌入，相同音频（如重复上传的录音）不再重复推理
+        self._embedding_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        
+        # 后台处理队列：上传请求排队，由固定数量的工作协程依次处理，避免多个识别流程争抢模型
+        # 工作协程需要运行中的事件循环，首次提交任务时再创建
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        
         # 初始化说话人识别状态
         self._reset_speaker_recognition_state()
     
+    def _ensure_workers(self):
+        """按需创建处理队列和工作协程"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < processing_config.PROCESSING_WORKERS:
+            self._workers.append(asyncio.create_task(self._worker()))
+    
+    async def _worker(self):
+        """后台处理工作协程：逐个取出排队的录音并处理"""
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process_audio_async(**job)
+            except Exception as e:
+                logger.error(f"后台处理录音 {job['recording_id']} 失败: {e}")
+            finally:
+                self._queue.task_done()
+    
     def _reset_speaker_recognition_state(self):
         """重置说话人识别状态"""
-        self._speaker_gallery = {}
+        self._speaker_gallery = SpeakerGallery()
         self._speaker_counter = 0
         self._speaker_history = []
         self._current_speaker = None
@@ -77,9 +144,10 @@ class RecordingProcessor:
             file_extension = audio_file.filename.split('.')[-1] if '.' in audio_file.filename else 'wav'
             saved_file_path = os.path.join(self.upload_dir, f"{recording_id}.{file_extension}")
             
-            async with aiofiles.open(saved_file_path, 'wb') as f:
-                content = await audio_file.read()
-                await f.write(content)
+            # 按1MiB分块流式写入，不把整个上传文件读入内存
+            async with aiofiles.open(saved_file_path, 'wb', buffering=1 << 20) as f:
+                while chunk := await audio_file.read(1 << 20):
+                    await f.write(chunk)
             
             # 2. 获取音频信息
             audio_info = await self._get_audio_info(saved_file_path)
@@ -93,6 +161,7 @@ class RecordingProcessor:
                 "id": recording_id,
                 "title": audio_file.filename or f"录音_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
                 "file_path": saved_file_path,
+                "media_type": ui_config.AUDIO_MEDIA_TYPES.get(f".{file_extension.lower()}", "audio/wav"),
                 "duration": audio_info["duration"],
                 "speaker_count": speaker_count,
                 "language": language,
@@ -102,8 +171,16 @@ class RecordingProcessor:
             
             db_manager.create_recording(recording_data)
             
-            # 4. 异步处理音频
-            asyncio.create_task(self._process_audio_async(recording_id, saved_file_path, speaker_count, language, options or {}))
+            # 4. 提交到后台处理队列
+            self._ensure_workers()
+            await self._queue.put({
+                "recording_id": recording_id,
+                "file_path": saved_file_path,
+                "speaker_count": speaker_count,
+                "language": language,
+                "options": options or {},
+            })
+            logger.info(f"录音 {recording_id} 已加入处理队列，当前排队数: {self._queue.qsize()}")
             
             return {
                 "success": True,
@@ -139,6 +216,7 @@ class RecordingProcessor:
         options: Dict[str, Any]
     ):
         """异步处理音频文件"""
+        save_task = None
         try:
             logger.info(f"开始异步处理录音 {recording_id}")
             
@@ -160,26 +238,33 @@ class RecordingProcessor:
             # 2. 文本后处理
             processed_segments = self._post_process_segments(segments, options)
             
-            # 3. 保存转录结果
-            db_manager.save_segments(recording_id, processed_segments)
+            # 3. 保存转录结果（在线程中写库，与后续AI分析并行进行）
+            async def save_transcription():
+                await asyncio.to_thread(db_manager.save_segments, recording_id, processed_segments)
+                
+                # 如果是自动识别模式，更新实际的发言人数量
+                if speaker_count == 0 and processed_segments:
+                    actual_speaker_count = len(set(seg["speaker_id"] for seg in processed_segments))
+                    await asyncio.to_thread(db_manager.update_recording_speaker_count, recording_id, actual_speaker_count)
+                    logger.info(f"自动识别完成，实际发言人数量: {actual_speaker_count}")
             
-            # 如果是自动识别模式，更新实际的发言人数量
-            if speaker_count == 0 and processed_segments:
-                actual_speaker_count = len(set(seg["speaker_id"] for seg in processed_segments))
-                db_manager.update_recording_speaker_count(recording_id, actual_speaker_count)
-                logger.info(f"自动识别完成，实际发言人数量: {actual_speaker_count}")
+            save_task = asyncio.create_task(save_transcription())
             
-            # 4. 生成智能摘要
+            # 4. 生成智能摘要并提取关键词（两者互不依赖，并发执行）
             full_text = " ".join([seg["content"] for seg in processed_segments])
             summary_type = options.get("summary_type", "meeting")
             
-            logger.info(f"开始生成摘要，文本长度: {len(full_text)}, 类型: {summary_type}")
+            logger.info(f"开始生成摘要和提取关键词，文本长度: {len(full_text)}, 类型: {summary_type}")
             
-            summary_result = await ai_service.generate_summary(full_text, summary_type)
+            summary_result, keywords_result = await asyncio.gather(
+                ai_service.generate_summary(full_text, summary_type),
+                ai_service.extract_keywords(full_text, max_keywords=8)
+            )
             logger.info(f"AI摘要生成结果: {summary_result}")
+            logger.info(f"关键词提取结果: {len(keywords_result) if keywords_result else 0} 个关键词")
             
             if summary_result:
-                db_manager.save_summary(recording_id, summary_result)
+                await asyncio.to_thread(db_manager.save_summary, recording_id, summary_result)
                 logger.info("摘要保存成功")
             else:
                 logger.warning("AI摘要生成失败，使用降级方案")
@@ -192,16 +277,12 @@ class RecordingProcessor:
                     "compression_ratio": 1.0,
                     "summary_type": summary_type
                 }
-                db_manager.save_summary(recording_id, fallback_summary)
+                await asyncio.to_thread(db_manager.save_summary, recording_id, fallback_summary)
                 logger.info("降级摘要保存成功")
             
-            # 5. 提取关键词
-            logger.info("开始提取关键词")
-            keywords_result = await ai_service.extract_keywords(full_text, max_keywords=8)
-            logger.info(f"关键词提取结果: {len(keywords_result) if keywords_result else 0} 个关键词")
-            
+            # 5. 保存关键词
             if keywords_result:
-                db_manager.save_keywords(recording_id, keywords_result)
+                await asyncio.to_thread(db_manager.save_keywords, recording_id, keywords_result)
                 logger.info("关键词保存成功")
             else:
                 logger.warning("关键词提取失败")
@@ -211,32 +292,59 @@ class RecordingProcessor:
                     {"word": "副产品", "count": 2, "score": 0.6, "source": "fallback"},
                     {"word": "营养", "count": 1, "score": 0.4, "source": "fallback"}
                 ]
-                db_manager.save_keywords(recording_id, simple_keywords)
+                await asyncio.to_thread(db_manager.save_keywords, recording_id, simple_keywords)
                 logger.info("降级关键词保存成功")
             
+            # 转录结果写入完成后再标记完成
+            await save_task
+            
             # 6. 更新处理状态
-            db_manager.update_recording_status(recording_id, "completed")
+            await asyncio.to_thread(db_manager.update_recording_status, recording_id, "completed")
             
             logger.info(f"录音 {recording_id} 处理完成")
             
         except Exception as e:
             logger.error(f"异步处理录音 {recording_id} 失败: {str(e)}")
-            db_manager.update_recording_status(recording_id, "failed")
+            if save_task is not None:
+                # 线程中的写库无法取消，等待其结束后再写失败状态，避免转录结果晚于失败状态落库
+                try:
+                    await save_task
+                except Exception as save_error:
+                    logger.warning(f"录音 {recording_id} 转录结果保存失败: {str(save_error)}")
+            await asyncio.to_thread(db_manager.update_recording_status, recording_id, "failed")
     
     async def _get_audio_info(self, file_path: str) -> Optional[Dict[str, Any]]:
-        """获取音频文件信息"""
+        """获取音频文件信息（按文件路径和修改时间缓存，上传时与后台处理时只读取一次）"""
         try:
-            # 先尝试作为音频文件读取
-            data, sample_rate = sf.read(file_path)
+            cache_key = (file_path, os.path.getmtime(file_path))
+        except OSError:
+            cache_key = None
+        
+        if cache_key is not None and cache_key in self._audio_info_cache:
+            self._audio_info_cache.move_to_end(cache_key)
+            return self._audio_info_cache[cache_key]
+        
+        audio_info = await self._read_audio_info(file_path)
+        if cache_key is not None and audio_info is not None:
+            self._audio_info_cache[cache_key] = audio_info
+            if len(self._audio_info_cache) > 16:
+                self._audio_info_cache.popitem(last=False)
+        return audio_info
+    
+    async def _read_audio_info(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """读取音频文件信息"""
+        try:
+            # 先尝试作为音频文件读取（只解析文件头，不解码音频数据）
+            info = sf.info(file_path)
             
             # 计算时长
-            duration = len(data) / sample_rate
+            duration = info.frames / info.samplerate
             
             return {
                 "duration": duration,
-                "sample_rate": sample_rate,
-                "channels": data.ndim,
-                "samples": len(data)
+                "sample_rate": info.samplerate,
+                "channels": info.channels,
+                "samples": info.frames
             }
             
         except Exception as e:
@@ -248,7 +356,7 @@ class RecordingProcessor:
                     content = f.read().strip()
                 
                 # 如果内容看起来像转写文本，创建虚拟音频信息
-                if content and ('发言人' in content or ':' in content):
+                if content and ('发言人' in content or ':' in content or '：' in content):
                     logger.info("检测到转写文本，进入演示模式")
                     
                     # 根据文本长度估算时长（假设平均语速）
@@ -276,19 +384,17 @@ class RecordingProcessor:
             logger.info("处理演示模式转写文本")
             
             segments = []
-            lines = content.strip().split('\n')
             current_time = 0.0
             
-            for line in lines:
+            for line in content.splitlines():
                 line = line.strip()
                 if not line:
                     continue
                 
                 # 解析发言人和内容
-                if ':' in line:
-                    parts = line.split(':', 1)
-                    speaker_id = parts[0].strip()
-                    text_content = parts[1].strip()
+                match = _DEMO_LINE_RE.fullmatch(line)
+                if match:
+                    speaker_id, text_content = match.groups()
                 else:
                     speaker_id = "发言人1"
                     text_content = line
@@ -322,16 +428,8 @@ class RecordingProcessor:
     ) -> List[Dict[str, Any]]:
         """音频转录和说话人分离"""
         try:
-            # 读取音频文件
-            audio_data, sample_rate = sf.read(file_path)
-            
-            # 确保是单声道
-            if audio_data.ndim > 1:
-                audio_data = np.mean(audio_data, axis=1)
-            
-            # 转换为浮点型
-            if audio_data.dtype != np.float32:
-                audio_data = audio_data.astype(np.float32)
+            # 读取音频文件（分块读取并直接下混为float32单声道，在线程中执行避免阻塞事件循环）
+            audio_data, sample_rate = await asyncio.to_thread(self._read_mono_audio, file_path)
             
             # 重采样到16kHz (如果需要)
             target_sample_rate = 16000
@@ -354,24 +452,92 @@ class RecordingProcessor:
             logger.error(f"音频转录和说话人分离失败: {str(e)}")
             return []
     
+    @staticmethod
+    def _read_mono_audio(file_path: str, block_seconds: int = 30) -> Tuple[np.ndarray, int]:
+        """分块读取音频文件，逐块下混写入预分配的float32单声道数组，不产生整段多声道/float64中间数组"""
+        with sf.SoundFile(file_path) as f:
+            sample_rate = f.samplerate
+            audio = np.empty(f.frames, dtype=np.float32)
+            pos = 0
+            for block in f.blocks(blocksize=sample_rate * block_seconds, dtype='float32', always_2d=True):
+                end = pos + len(block)
+                if end > len(audio):
+                    # 部分格式的帧数信息不准确，按需扩容
+                    audio = np.concatenate((audio[:pos], np.empty(max(end - pos, len(audio)), dtype=np.float32)))
+                if block.shape[1] == 1:
+                    audio[pos:end] = block[:, 0]
+                else:
+                    np.mean(block, axis=1, out=audio[pos:end])
+                pos = end
+        return audio[:pos], sample_rate
+    
     def _resample_audio(self, audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
         """重采样音频"""
         try:
-            # 简单的线性插值重采样
-            ratio = target_sr / orig_sr
-            new_length = int(len(audio) * ratio)
-            
-            # 使用numpy的插值函数
-            x_old = np.linspace(0, len(audio) - 1, len(audio))
-            x_new = np.linspace(0, len(audio) - 1, new_length)
-            
-            resampled = np.interp(x_new, x_old, audio)
-            return resampled.astype(np.float32)
+            # 多相滤波重采样：带抗混叠滤波，且不需要构造整段长度的插值坐标数组
+            from math import gcd
+            from scipy.signal import resample_poly
+            factor = gcd(int(orig_sr), int(target_sr))
+            resampled = resample_poly(audio, int(target_sr) // factor, int(orig_sr) // factor)
+            return resampled.astype(np.float32, copy=False)
             
         except Exception as e:
             logger.error(f"音频重采样失败: {str(e)}")
             return audio
     
+    @staticmethod
+    def _embedding_key(audio_chunk: np.ndarray) -> bytes:
+        """声纹嵌入缓存键：float32音频内容的指纹"""
+        return hashlib.blake2b(audio_chunk.tobytes(), digest_size=16).digest()
+    
+    def _cache_embedding(self, key: bytes, embedding: np.ndarray):
+        """写入声纹嵌入缓存，超出容量时淘汰最久未用的条目"""
+        self._embedding_cache[key] = embedding
+        if len(self._embedding_cache) > processing_config.SPEAKER_EMBEDDING_CACHE_SIZE:
+            self._embedding_cache.popitem(last=False)
+    
+    async def _get_speaker_embedding(self, audio_chunk: np.ndarray) -> Optional[np.ndarray]:
+        """按音频内容指纹缓存声纹嵌入，提取失败时返回None"""
+        audio_chunk = np.ascontiguousarray(audio_chunk, dtype=np.float32)
+        key = self._embedding_key(audio_chunk)
+        embedding = self._embedding_cache.get(key)
+        if embedding is not None:
+            self._embedding_cache.move_to_end(key)
+            return embedding
+        
+        try:
+            embedding = await async_sv_embedding(audio_chunk)
+        except Exception as e:
+            logger.error(f"提取声纹嵌入失败: {str(e)}")
+            return None
+        
+        self._cache_embedding(key, embedding)
+        return embedding
+    
+    async def _prefetch_speaker_embeddings(self, audios: List[np.ndarray]):
+        """批量提取缓存中还没有的声纹嵌入，随后逐段识别说话人时直接命中缓存"""
+        pending = {}
+        for audio in audios:
+            if not check_audio_quality(audio):
+                continue
+            audio = np.ascontiguousarray(audio, dtype=np.float32)
+            key = self._embedding_key(audio)
+            if key not in self._embedding_cache:
+                pending.setdefault(key, audio)
+        
+        items = list(pending.items())
+        batch_size = processing_config.SPEAKER_EMBEDDING_BATCH
+        for i in range(0, len(items), batch_size):
+            batch = items[i:i + batch_size]
+            try:
+                embeddings = await async_sv_embedding_batch([audio for _, audio in batch])
+            except Exception as e:
+                # 剩余片段在识别时逐段提取
+                logger.warning(f"批量提取声纹嵌入失败: {str(e)}")
+                return
+            for (key, _), embedding in zip(batch, embeddings):
+                self._cache_embedding(key, embedding)
+    
     async def _identify_speakers(
         self, 
         audio_chunk: np.ndarray, 
@@ -383,6 +549,9 @@ class RecordingProcessor:
             # 设置说话人识别阈值
             sv_thr = 0.4
             
+            # 质量不合格的片段不提取嵌入，由识别算法沿用当前说话人
+            embedding = await self._get_speaker_embedding(audio_chunk) if check_audio_quality(audio_chunk) else None
+            
             # 使用真正的说话人识别算法
             speaker_id, updated_gallery, updated_counter, updated_history, updated_current = await diarize_speaker_online_improved_async(
                 audio_chunk,
@@ -390,7 +559,8 @@ class RecordingProcessor:
                 self._speaker_counter,
                 sv_thr,
                 self._speaker_history,
-                self._current_speaker
+                self._current_speaker,
+                embedding=embedding
             )
             
             # 更新状态变量
@@ -441,20 +611,43 @@ class RecordingProcessor:
             logger.info(f"开始VAD模拟处理，音频长度: {len(audio_data)/sample_rate:.1f}秒")
             
             # 1. 生成音频分段
-            chunks = self._simulate_vad_processing(audio_data, sample_rate)
+            chunks = [
+                chunk_data for chunk_data in self._simulate_vad_processing(audio_data, sample_rate)
+                if self._is_valid_audio_chunk(chunk_data['chunk'], sample_rate)
+            ]
             
-            # 2. 处理每个分段
+            # 2. 语音识别与分段前后无关，每批分段一次模型调用完成；分批执行以免长录音长时间独占推理，影响实时会话
+            transcriptions = []
+            batch_size = processing_config.ASR_BATCH_CHUNKS
+            for i in range(0, len(chunks), batch_size):
+                batch = [chunk_data['chunk'] for chunk_data in chunks[i:i + batch_size]]
+                try:
+                    asr_results = await asr_async_batch(batch, language, True)
+                    transcriptions.extend(self._parse_asr_result([asr_result]) for asr_result in asr_results)
+                except Exception as e:
+                    logger.error(f"分段批量语音识别失败: {str(e)}")
+                    transcriptions.extend(("", -1.0) for _ in batch)
+            
+            # 3. 按识别结果把各分段细分为待识别说话人的音频段（与说话人状态无关）
+            planned = []
+            for chunk_data, (text_content, asr_confidence) in zip(chunks, transcriptions):
+                for part in self._plan_chunk_segments(
+                    chunk_data['chunk'], sample_rate, text_content, asr_confidence, chunk_data['start_time']
+                ):
+                    planned.append((part, asr_confidence))
+            
+            # 4. 声纹嵌入分批一次管线调用提取；说话人识别依赖前序段落的状态，按时间顺序逐段进行，只做嵌入比对
             all_segments = []
-            for chunk_data in chunks:
-                if not self._is_valid_audio_chunk(chunk_data['chunk'], sample_rate):
-                    continue
-                
-                # 3. 进一步细分chunk以适合说话人识别
-                sub_segments = await self._process_chunk_with_fine_segmentation(
-                    chunk_data['chunk'], sample_rate, language, 
-                    chunk_data['start_time'], speaker_count
-                )
-                all_segments.extend(sub_segments)
+            for i in range(0, len(planned), batch_size):
+                batch = planned[i:i + batch_size]
+                await self._prefetch_speaker_embeddings([part["audio"] for part, _ in batch])
+                for part, asr_confidence in batch:
+                    speaker_result = await self._identify_speakers(part["audio"], sample_rate, speaker_count)
+                    if not self._validate_segment_quality(speaker_result, part["content"]):
+                        continue
+                    all_segments.append(self._create_segment_data(
+                        part["content"], part["start_time"], part["end_time"], speaker_result, asr_confidence
+                    ))
             
             logger.info(f"VAD模拟处理完成，生成 {len(all_segments)} 个语音段落")
             return all_segments
@@ -491,39 +684,31 @@ class RecordingProcessor:
         
         return chunks
     
-    async def _process_chunk_with_fine_segmentation(
+    def _plan_chunk_segments(
         self,
         chunk: np.ndarray,
-        sample_rate: int, 
-        language: str,
-        base_time: float,
-        speaker_count: int
+        sample_rate: int,
+        text_content: str,
+        asr_confidence: float,
+        base_time: float
     ) -> List[Dict[str, Any]]:
-        """对chunk进行细分处理，确保适合说话人识别"""
+        """根据识别结果对chunk进行细分，返回待识别说话人的音频段 [{audio, content, start_time, end_time}, ...]"""
         try:
-            # 1. 转录音频获取文本
-            text_content, asr_confidence = await self._transcribe_chunk(chunk, language)
             if not text_content:
                 return []
             
-            # 2. 检查ASR置信度
+            # 检查ASR置信度
             if asr_confidence < quality_config.MIN_ASR_CONFIDENCE:
                 logger.debug(f"ASR置信度太低({asr_confidence:.3f})，跳过: '{text_content}'")
                 return []
             
-            # 3. 根据chunk长度选择处理策略
+            # 根据chunk长度选择处理策略
             chunk_duration_ms = len(chunk) / sample_rate * 1000
             
             if chunk_duration_ms <= audio_config.MAX_SIMPLE_CHUNK_DURATION * 1000:
-                return await self._process_simple_chunk(
-                    chunk, sample_rate, text_content, base_time, 
-                    speaker_count, asr_confidence
-                )
+                return [self._plan_simple_chunk(chunk, sample_rate, text_content, base_time)]
             else:  # 超过5秒，进行细分
-                return await self._process_complex_chunk(
-                    chunk, sample_rate, text_content, base_time, 
-                    speaker_count, asr_confidence
-                )
+                return self._plan_complex_chunk(chunk, sample_rate, text_content, base_time)
             
         except Exception as e:
             logger.error(f"细分处理失败: {str(e)}")
@@ -533,7 +718,10 @@ class RecordingProcessor:
         """转录音频chunk获取文本"""
         cache_asr = {}
         asr_result = await asr_async(chunk, language, cache_asr, True)
-        
+        return self._parse_asr_result(asr_result)
+    
+    def _parse_asr_result(self, asr_result) -> Tuple[str, float]:
+        """从ASR结果中提取清理后的文本和置信度"""
         if not asr_result:
             return "", -1.0
             
@@ -558,38 +746,29 @@ class RecordingProcessor:
         
         return text_content, asr_confidence
 
-    async def _process_simple_chunk(
+    def _plan_simple_chunk(
         self, 
         chunk: np.ndarray, 
         sample_rate: int, 
         text_content: str, 
-        base_time: float,
-        speaker_count: int, 
-        asr_confidence: float
-    ) -> List[Dict[str, Any]]:
-        """处理5秒以内的简单chunk"""
-        speaker_result = await self._identify_speakers(chunk, sample_rate, speaker_count)
-        
-        # 验证说话人识别质量
-        if not self._validate_segment_quality(speaker_result, text_content):
-            return []
-        
-        segment_data = self._create_segment_data(
-            text_content, base_time, base_time + len(chunk) / sample_rate,
-            speaker_result, asr_confidence
-        )
-        return [segment_data]
+        base_time: float
+    ) -> Dict[str, Any]:
+        """5秒以内的简单chunk整体作为一段"""
+        return {
+            "audio": chunk,
+            "content": text_content,
+            "start_time": base_time,
+            "end_time": base_time + len(chunk) / sample_rate
+        }
 
-    async def _process_complex_chunk(
+    def _plan_complex_chunk(
         self, 
         chunk: np.ndarray, 
         sample_rate: int, 
         text_content: str, 
-        base_time: float,
-        speaker_count: int, 
-        asr_confidence: float
+        base_time: float
     ) -> List[Dict[str, Any]]:
-        """处理超过5秒的复杂chunk，进行细分"""
+        """超过5秒的复杂chunk进行细分"""
         max_sub_duration = audio_config.MAX_SUB_DURATION
         max_sub_samples = int(max_sub_duration * sample_rate)
         
@@ -597,10 +776,7 @@ class RecordingProcessor:
         if len(words) <= 1:
             # 文本太短，不细分，但限制音频长度
             limited_chunk = chunk[:max_sub_samples]
-            return await self._process_simple_chunk(
-                limited_chunk, sample_rate, text_content, base_time,
-                speaker_count, asr_confidence
-            )
+            return [self._plan_simple_chunk(limited_chunk, sample_rate, text_content, base_time)]
         
         # 按音频长度和文本长度合理分割
         chunk_duration_ms = len(chunk) / sample_rate * 1000
@@ -608,23 +784,22 @@ class RecordingProcessor:
         part_samples = len(chunk) // num_parts
         words_per_part = len(words) // num_parts
         
-        segments = []
+        parts = []
         for part_idx in range(num_parts):
-            segment = await self._process_chunk_part(
-                chunk, sample_rate, words, base_time, speaker_count,
-                asr_confidence, part_idx, num_parts, part_samples, words_per_part
+            part = self._plan_chunk_part(
+                chunk, sample_rate, words, base_time,
+                part_idx, num_parts, part_samples, words_per_part
             )
-            if segment:
-                segments.append(segment)
+            if part:
+                parts.append(part)
         
-        return segments
+        return parts
 
-    async def _process_chunk_part(
+    def _plan_chunk_part(
         self, chunk: np.ndarray, sample_rate: int, words: list, base_time: float,
-        speaker_count: int, asr_confidence: float, part_idx: int, num_parts: int,
-        part_samples: int, words_per_part: int
+        part_idx: int, num_parts: int, part_samples: int, words_per_part: int
     ) -> Optional[Dict[str, Any]]:
-        """处理chunk的一个部分"""
+        """切分chunk的一个部分"""
         start_sample = part_idx * part_samples
         end_sample = min((part_idx + 1) * part_samples, len(chunk))
         part_chunk = chunk[start_sample:end_sample]
@@ -652,19 +827,12 @@ class RecordingProcessor:
             logger.debug(f"分割音频质量不合格，跳过: '{part_text}'")
             return None
         
-        # 说话人识别
-        speaker_result = await self._identify_speakers(part_chunk, sample_rate, speaker_count)
-        
-        # 验证质量
-        if not self._validate_segment_quality(speaker_result, part_text):
-            return None
-        
-        part_start_time = base_time + start_sample / sample_rate
-        part_end_time = base_time + end_sample / sample_rate
-        
-        return self._create_segment_data(
-            part_text, part_start_time, part_end_time, speaker_result, asr_confidence
-        )
+        return {
+            "audio": part_chunk,
+            "content": part_text,
+            "start_time": base_time + start_sample / sample_rate,
+            "end_time": base_time + end_sample / sample_rate
+        }
 
     def _validate_segment_quality(self, speaker_result: Dict[str, Any], text_content: str) -> bool:
         """验证segment质量"""
@@ -749,14 +917,22 @@ class RecordingProcessor:
             logger.debug(f"音频时长太短({duration:.2f}s)，跳过")
             return False
         
+        # 能量和方差在复用的float32缓冲区中计算，避免每个片段分配临时数组
+        n = len(chunk)
+        if self._chunk_scratch.size < n:
+            self._chunk_scratch = np.empty(n, dtype=np.float32)
+        scratch = self._chunk_scratch[:n]
+        
         # 2. 检查音频能量（避免完全静音）
-        audio_energy = np.mean(np.abs(chunk))
+        np.abs(chunk, out=scratch)
+        audio_energy = scratch.mean()
         if audio_energy < 0.00001:  # 降低能量阈值
             logger.debug(f"音频能量太低({audio_energy:.6f})，跳过")
             return False
         
         # 3. 检查音频动态范围（只检查是否完全静音）
-        audio_std = np.std(chunk)
+        np.subtract(chunk, chunk.mean(), out=scratch)
+        audio_std = np.sqrt(np.dot(scratch, scratch) / n)
         if audio_std < 0.000001:  # 降低方差阈值
             logger.debug(f"音频动态范围太小({audio_std:.6f})，跳过")
             return False
@@ -770,15 +946,17 @@ class RecordingProcessor:
 
         merged = []
         current_segment = None
+        current_parts = []  # 当前段落的文本片段，结束时一次拼接，避免重复复制累积字符串
         PAUSE_THRESHOLD = segment_config.SILENCE_THRESHOLD_MS / 1000  # 转换为秒
 
         for segment in segments:
             if current_segment is None:
                 current_segment = segment.copy()
+                current_parts = [segment["content"]]
             elif (current_segment["speaker_id"] == segment["speaker_id"] and 
                   segment["start_time"] - current_segment["end_time"] < PAUSE_THRESHOLD):  # 1.5秒内的间隔合并
                 # 合并段落：连续说话且同一发言人
-                current_segment["content"] += segment["content"]  # 直接连接，不加空格（避免不必要的断词）
+                current_parts.append(segment["content"])  # 直接连接，不加空格（避免不必要的断词）
                 current_segment["end_time"] = segment["end_time"]
                 # 置信度取加权平均而不是最小值
                 duration1 = current_segment["end_time"] - current_segment["start_time"]
@@ -790,10 +968,13 @@ class RecordingProcessor:
                 ) / total_duration
             else:
                 # 开始新段落：发言人变更或停顿超过1.5秒
+                current_segment["content"] = "".join(current_parts)
                 merged.append(current_segment)
                 current_segment = segment.copy()
+                current_parts = [segment["content"]]
 
         if current_segment:
+            current_segment["content"] = "".join(current_parts)
             merged.append(current_segment)
 
         return merged
@@ -804,33 +985,35 @@ class RecordingProcessor:
         options: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
         """文本后处理"""
-        processed_segments = []
-        speaker_id_to_index = {}  # 发言人ID到索引的映射，确保颜色分配正确
+        # 按首次出现顺序为发言人分配唯一索引，名称和颜色每个发言人只计算一次
+        speaker_colors = self.speaker_colors
+        speaker_ids = dict.fromkeys(segment["speaker_id"] for segment in segments)
+        speaker_styles = {
+            speaker_id: (f"发言人{index + 1}", speaker_colors[index % len(speaker_colors)])
+            for index, speaker_id in enumerate(speaker_ids)
+        }
+        
+        # 循环内用到的选项和函数提前取出
+        smart_punctuation = options.get("smart_punctuation", True)
+        number_conversion = options.get("number_conversion", True)
+        convert_numbers = self._smart_convert_numbers  # 使用智能数字转换
         
-        for i, segment in enumerate(segments):
+        processed_segments = []
+        for segment in segments:
             # 文本格式化
             content = segment["content"]
             
             # 应用处理选项
-            if options.get("smart_punctuation", True):
+            if smart_punctuation:
                 content = format_str_v3(content)
             
-            if options.get("number_conversion", True):
-                content = self._smart_convert_numbers(content)  # 使用智能数字转换
+            if number_conversion:
+                content = convert_numbers(content)
             
-            # 分配发言人名称和颜色（修复颜色分配逻辑）
             speaker_id = segment["speaker_id"]
-            if speaker_id not in speaker_id_to_index:
-                speaker_id_to_index[speaker_id] = len(speaker_id_to_index)  # 分配唯一索引
-            
-            speaker_index = speaker_id_to_index[speaker_id] + 1  # 从1开始显示
-            speaker_name = f"发言人{speaker_index}"
-            
-            # 根据发言人的唯一索引分配颜色
-            color_index = speaker_id_to_index[speaker_id] % len(self.speaker_colors)
-            speaker_color = self.speaker_colors[color_index]
+            speaker_name, speaker_color = speaker_styles[speaker_id]
             
-            processed_segment = {
+            processed_segments.append({
                 "speaker_id": speaker_id,
                 "speaker_name": speaker_name,
                 "speaker_color": speaker_color,
@@ -838,58 +1021,21 @@ class RecordingProcessor:
                 "start_time": segment["start_time"],
                 "end_time": segment["end_time"],
                 "confidence": segment["confidence"]
-            }
-            
-            processed_segments.append(processed_segment)
+            })
         
         return processed_segments
     
     def _smart_convert_numbers(self, text: str) -> str:
         """智能数字转换（参考实时处理逻辑，避免过度转换）"""
+        # 不含任何数字词的文本（大多数段落）直接返回
+        if _NUMBER_HINT_RE.search(text) is None:
+            return text
+        
         try:
-            import re
-            
-            # 只转换明确的数字表达，避免过度转换
-            # 1. 转换独立的数字词（前后有空格或标点）
-            patterns = [
-                (r'\b一\b', '1'),
-                (r'\b二\b', '2'),
-                (r'\b三\b', '3'),  
-                (r'\b四\b', '4'),
-                (r'\b五\b', '5'),
-                (r'\b六\b', '6'),
-                (r'\b七\b', '7'),
-                (r'\b八\b', '8'),
-                (r'\b九\b', '9'),
-                (r'\b十\b', '10'),
-                # 2. 转换数量表达
-                (r'(\d+)个([小时|分钟|秒钟|天|周|月|年])', r'\1\2'),
-                # 3. 转换序数表达  
-                (r'第一', '第1'),
-                (r'第二', '第2'),
-                (r'第三', '第3'),
-                (r'第四', '第4'),
-                (r'第五', '第5'),
-            ]
-            
-            for pattern, replacement in patterns:
-                text = re.sub(pattern, replacement, text)
+            for pattern, replacement in _NUMBER_PATTERNS:
+                text = pattern.sub(replacement, text)
             
-            # 4. 保留常用词汇中的数字不转换（如：小米、三个、一些、一起等）
-            # 这些词汇在实时处理中也不会被转换
-            preserve_patterns = [
-                '小米',  # 保留品牌名
-                '一些', '一起', '一下', '一个', '一条', '一次',  # 保留常用搭配
-                '三个', '两个',  # 保留量词搭配
-                '十分', '九分',  # 保留程度副词
-            ]
-            
-            # 如果包含这些词汇，恢复原始数字
-            for preserve in preserve_patterns:
-                if preserve in text:
-                    # 根据具体情况恢复，这里简化处理
-                    continue
-                    
+            # 常用词汇中的数字（如：小米、三个、一些、一起等）前后不是词边界，不会被上面的规则转换
             return text
             
         except Exception as e:
@@ -918,18 +1064,19 @@ class RecordingProcessor:
     async def regenerate_summary(self, recording_id: str, summary_type: str = "meeting") -> Dict[str, Any]:
         """重新生成摘要"""
         try:
-            # 获取转录文本
-            segments = db_manager.get_segments(recording_id)
-            if not segments:
+            # 获取转录文本（优先读取保存段落时写入的全文，旧数据回退到拼接段落）
+            full_text = await asyncio.to_thread(db_manager.get_full_text, recording_id)
+            if full_text is None:
+                segments = await asyncio.to_thread(db_manager.get_segments, recording_id)
+                full_text = " ".join([seg["content"] for seg in segments])
+            if not full_text:
                 return {"error": "未找到转录内容"}
             
-            full_text = " ".join([seg["content"] for seg in segments])
-            
-            # 生成新摘要
-            summary_result = await ai_service.generate_summary(full_text, summary_type)
+            # 生成新摘要（用户主动要求重新生成，不复用缓存的摘要）
+            summary_result = await ai_service.generate_summary(full_text, summary_type, use_cache=False)
             if summary_result:
                 summary_result["summary_type"] = summary_type
-                db_manager.save_summary(recording_id, summary_result)
+                await asyncio.to_thread(db_manager.save_summary, recording_id, summary_result)
                 return {"success": True, "summary": summary_result}
             else:
                 return {"error": "摘要生成失败"}
@@ -9,7 +9,7 @@ import numpy as np
 from loguru import logger
 
 from config import config
-from model_service import async_sv_pipeline
+from model_service import async_sv_embedding
 
 
 class SpeakerRecognitionConfig:
@@ -66,24 +66,70 @@ def check_audio_quality(audio_segment: np.ndarray, sample_rate: int = 16000) ->
     return True
 
 
+class SpeakerGallery:
+    """
+    会话声纹库：所有说话人嵌入连续存放在一个 (N, D) 矩阵中，
+    一次矩阵-向量乘法即可完成与全部说话人的比对
+    """
+    def __init__(self):
+        self.speaker_ids: List[str] = []
+        self._embeddings: Optional[np.ndarray] = None
+    
+    def __len__(self) -> int:
+        return len(self.speaker_ids)
+    
+    def __contains__(self, speaker_id: str) -> bool:
+        return speaker_id in self.speaker_ids
+    
+    def add(self, speaker_id: str, embedding: np.ndarray):
+        """注册新说话人的归一化嵌入"""
+        count = len(self.speaker_ids)
+        if self._embeddings is None:
+            self._embeddings = np.empty((SpeakerRecognitionConfig.MAX_SPEAKERS, len(embedding)), dtype=np.float32)
+        elif count == len(self._embeddings):
+            # 容量翻倍，摊销扩容开销
+            grown = np.empty((count * 2, self._embeddings.shape[1]), dtype=np.float32)
+            grown[:count] = self._embeddings
+            self._embeddings = grown
+        self._embeddings[count] = embedding
+        self.speaker_ids.append(speaker_id)
+    
+    def scores(self, embedding: np.ndarray) -> dict:
+        """计算嵌入与所有已注册说话人的余弦相似度 {speaker_id: score}"""
+        sims = self._embeddings[:len(self.speaker_ids)] @ embedding
+        return dict(zip(self.speaker_ids, sims.tolist()))
+    
+    @classmethod
+    def ensure(cls, gallery) -> "SpeakerGallery":
+        """兼容以dict形式传入的声纹库（如初始的空字典）"""
+        if isinstance(gallery, cls):
+            return gallery
+        converted = cls()
+        for speaker_id, embedding in (gallery or {}).items():
+            converted.add(speaker_id, embedding)
+        return converted
+
+
 async def diarize_speaker_online_improved_async(
     audio_segment: np.ndarray, 
-    speaker_gallery: dict, 
+    speaker_gallery: SpeakerGallery, 
     speaker_counter: int, 
     sv_thr: float,
     speaker_history: Optional[List] = None, 
-    current_speaker: Optional[str] = None
-) -> Tuple[str, dict, int, List, str]:
+    current_speaker: Optional[str] = None,
+    embedding: Optional[np.ndarray] = None
+) -> Tuple[str, SpeakerGallery, int, List, str]:
     """
     改进的异步在线说话人日志分析函数
     
     Args:
         audio_segment: 当前的语音片段
-        speaker_gallery: 当前会话的声纹库 {speaker_id: reference_audio}
+        speaker_gallery: 当前会话的声纹库（SpeakerGallery）
         speaker_counter: 当前会话的说话人计数器
         sv_thr: 声纹比对的相似度阈值
         speaker_history: 说话人历史记录 [(speaker_id, confidence, timestamp), ...]
         current_speaker: 当前活跃的说话人
+        embedding: 调用方已提取好的声纹嵌入（可选，提供时不再重复推理）
         
     Returns:
         tuple: (识别出的speaker_id, 更新后的speaker_gallery, 更新后的speaker_counter, 
@@ -91,9 +137,10 @@ async def diarize_speaker_online_improved_async(
     """
     current_time = time.time()
     
-    # 初始化历史记录
+    # 初始化历史记录和声纹库
     if speaker_history is None:
         speaker_history = []
+    speaker_gallery = SpeakerGallery.ensure(speaker_gallery)
     
     # 检查音频质量
     if not check_audio_quality(audio_segment):
@@ -104,49 +151,32 @@ async def diarize_speaker_online_improved_async(
         else:
             return "发言人", speaker_gallery, speaker_counter, speaker_history, current_speaker
     
+    # 提取当前片段的声纹嵌入（每个片段只做一次模型推理）
+    try:
+        if embedding is None:
+            embedding = await async_sv_embedding(audio_segment)
+    except Exception as e:
+        logger.error(f"Error extracting speaker embedding: {e}")
+        # 如果嵌入提取失败，使用当前说话人或默认值
+        if current_speaker:
+            return current_speaker, speaker_gallery, speaker_counter, speaker_history, current_speaker
+        else:
+            return "发言人", speaker_gallery, speaker_counter, speaker_history, current_speaker
+    
     # 如果是第一个说话人
     if not speaker_gallery:
         speaker_counter += 1
         speaker_id = f"发言人{speaker_counter}"
-        speaker_gallery[speaker_id] = audio_segment
+        speaker_gallery.add(speaker_id, embedding)
         speaker_history.append((speaker_id, 1.0, current_time))
         logger.info(f"First speaker detected. Assigning ID: {speaker_id}")
         return speaker_id, speaker_gallery, speaker_counter, speaker_history, speaker_id
     
-    # 与声纹库中的所有说话人进行并发比对
-    comparison_tasks = []
-    speaker_ids = list(speaker_gallery.keys())
-    
-    for spk_id in speaker_ids:
-        ref_audio = speaker_gallery[spk_id]
-        task = async_sv_pipeline([audio_segment, ref_audio])
-        comparison_tasks.append((spk_id, task))
-    
-    # 并发执行所有说话人验证
-    best_score = -1.0
-    identified_speaker = None
-    scores = {}
-    
-    try:
-        for spk_id, task in comparison_tasks:
-            try:
-                res_sv = await task
-                score = res_sv["score"]
-                scores[spk_id] = score
-                logger.debug(f"Comparing with '{spk_id}', score: {score:.4f}")
-                if score > best_score:
-                    best_score = score
-                    identified_speaker = spk_id
-            except Exception as e:
-                logger.error(f"Error during speaker comparison with {spk_id}: {e}")
-                continue
-    except Exception as e:
-        logger.error(f"Error during concurrent speaker verification: {e}")
-        # 如果并发比对失败，使用当前说话人或默认值
-        if current_speaker:
-            return current_speaker, speaker_gallery, speaker_counter, speaker_history, current_speaker
-        else:
-            return "发言人", speaker_gallery, speaker_counter, speaker_history, current_speaker
+    # 与声纹库中的所有说话人一次性比对
+    scores = speaker_gallery.scores(embedding)
+    identified_speaker = max(scores, key=scores.get)
+    best_score = scores[identified_speaker]
+    logger.debug(f"Speaker scores: {scores}")
     
     # 动态阈值调整：基于历史记录和当前说话人
     dynamic_threshold = sv_thr
@@ -183,7 +213,7 @@ async def diarize_speaker_online_improved_async(
         # 创建新说话人
         speaker_counter += 1
         new_speaker_id = f"发言人{speaker_counter}"
-        speaker_gallery[new_speaker_id] = audio_segment
+        speaker_gallery.add(new_speaker_id, embedding)
         speaker_history.append((new_speaker_id, 0.8, current_time))
         logger.info(f"New speaker detected (all scores < {sv_thr * 0.7:.3f}). Assigning ID: {new_speaker_id}")
         return new_speaker_id, speaker_gallery, speaker_counter, speaker_history, new_speaker_id
@@ -198,21 +228,21 @@ async def diarize_speaker_online_improved_async(
 
 def diarize_speaker_online_improved(
     audio_segment: np.ndarray, 
-    speaker_gallery: dict, 
+    speaker_gallery: SpeakerGallery, 
     speaker_counter: int, 
     sv_thr: float,
     speaker_history: Optional[List] = None, 
     current_speaker: Optional[str] = None
-) -> Tuple[str, dict, int, List, str]:
+) -> Tuple[str, SpeakerGallery, int, List, str]:
     """
     改进的在线说话人日志分析函数（同步版本，保持兼容性）
     """
-    import time
-    from model_service import sv_pipeline
+    from model_service import sv_embedding
     
-    # 初始化历史记录
+    # 初始化历史记录和声纹库
     if speaker_history is None:
         speaker_history = []
+    speaker_gallery = SpeakerGallery.ensure(speaker_gallery)
     current_time = time.time()
     
     # 检查音频质量
@@ -223,32 +253,30 @@ def diarize_speaker_online_improved(
         else:
             return "发言人", speaker_gallery, speaker_counter, speaker_history, current_speaker
     
+    # 提取当前片段的声纹嵌入
+    try:
+        embedding = sv_embedding(audio_segment)
+    except Exception as e:
+        logger.error(f"Error extracting speaker embedding: {e}")
+        if current_speaker:
+            return current_speaker, speaker_gallery, speaker_counter, speaker_history, current_speaker
+        else:
+            return "发言人", speaker_gallery, speaker_counter, speaker_history, current_speaker
+    
     # 如果是第一个说话人
     if not speaker_gallery:
         speaker_counter += 1
         speaker_id = f"发言人{speaker_counter}"
-        speaker_gallery[speaker_id] = audio_segment
+        speaker_gallery.add(speaker_id, embedding)
         speaker_history.append((speaker_id, 1.0, current_time))
         logger.info(f"First speaker detected. Assigning ID: {speaker_id}")
         return speaker_id, speaker_gallery, speaker_counter, speaker_history, speaker_id
     
-    # 与声纹库中的所有说话人进行比对
-    best_score = -1.0
-    identified_speaker = None
-    scores = {}
-    
-    for spk_id, ref_audio in speaker_gallery.items():
-        try:
-            res_sv = sv_pipeline([audio_segment, ref_audio])
-            score = res_sv["score"]
-            scores[spk_id] = score
-            logger.debug(f"Comparing with '{spk_id}', score: {score:.4f}")
-            if score > best_score:
-                best_score = score
-                identified_speaker = spk_id
-        except Exception as e:
-            logger.error(f"Error during speaker comparison with {spk_id}: {e}")
-            continue
+    # 与声纹库中的所有说话人一次性比对
+    scores = speaker_gallery.scores(embedding)
+    identified_speaker = max(scores, key=scores.get)
+    best_score = scores[identified_speaker]
+    logger.debug(f"Speaker scores: {scores}")
     
     # 动态阈值调整
     dynamic_threshold = sv_thr
@@ -279,7 +307,7 @@ def diarize_speaker_online_improved(
     if all_scores_low:
         speaker_counter += 1
         new_speaker_id = f"发言人{speaker_counter}"
-        speaker_gallery[new_speaker_id] = audio_segment
+        speaker_gallery.add(new_speaker_id, embedding)
         speaker_history.append((new_speaker_id, 0.8, current_time))
         logger.info(f"New speaker detected (all scores < {sv_thr * 0.7:.3f}). Assigning ID: {new_speaker_id}")
         return new_speaker_id, speaker_gallery, speaker_counter, speaker_history, new_speaker_id
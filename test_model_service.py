@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+测试ASR批量识别：合并后的多段音频只调用一次模型
+"""
+
+import asyncio
+
+import numpy as np
+
+import model_service
+from config import config
+
+
+class FakeASRModel:
+    """记录generate调用的假ASR模型，每段输入返回一个结果"""
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, input, **kwargs):
+        self.calls.append((input, kwargs))
+        return [{"key": str(i), "text": f"text{i}"} for i in range(len(input))]
+
+
+def make_clips(count):
+    """生成长度各不相同的测试音频片段"""
+    return [np.zeros(1600 * (i + 1), dtype=np.float32) for i in range(count)]
+
+
+def use_fake_model(monkeypatch):
+    fake = FakeASRModel()
+    monkeypatch.setattr(model_service, "model_asr", fake)
+    monkeypatch.setattr(config, "use_gpu", False)
+    return fake
+
+
+def test_asr_generate_batch_single_invocation(monkeypatch):
+    """多段音频一次模型调用，并显式指定批大小"""
+    fake = use_fake_model(monkeypatch)
+
+    results = model_service._asr_generate_batch(make_clips(3), "auto", True)
+
+    assert len(fake.calls) == 1
+    clips, kwargs = fake.calls[0]
+    assert len(clips) == 3
+    assert kwargs["batch_size"] == 3
+    assert [result["text"] for result in results] == ["text0", "text1", "text2"]
+
+
+def test_asr_async_batch_single_invocation(monkeypatch):
+    """异步批量识别同样只调用一次模型"""
+    fake = use_fake_model(monkeypatch)
+
+    results = asyncio.run(model_service.asr_async_batch(make_clips(4), "auto ", True))
+
+    assert len(fake.calls) == 1
+    assert fake.calls[0][1]["batch_size"] == 4
+    assert fake.calls[0][1]["language"] == "auto"
+    assert len(results) == 4
+
+
+def test_asr_batch_worker_merges_requests(monkeypatch):
+    """批处理队列把同时到达的请求合并为一次模型调用，结果按请求分发"""
+    fake = use_fake_model(monkeypatch)
+    monkeypatch.setattr(model_service, "asr_queue", None)
+
+    async def run():
+        model_service.asr_queue = asyncio.Queue()
+        worker = asyncio.create_task(model_service.asr_batch_worker())
+        try:
+            return await asyncio.gather(
+                *(model_service.async_asr_generate(clip, "auto", {}, True) for clip in make_clips(3))
+            )
+        finally:
+            worker.cancel()
+
+    results = asyncio.run(run())
+
+    assert len(fake.calls) == 1
+    assert fake.calls[0][1]["batch_size"] == 3
+    assert [result[0]["text"] for result in results] == ["text0", "text1", "text2"]
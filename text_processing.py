@@ -37,6 +37,10 @@ lang_dict = {
 # 表情和事件集合
 emo_set = {"😊", "😔", "😡", "😰", "🤢", "😮"}
 event_set = {"🎼", "👏", "😀", "😭", "🤧", "😷"}
+_emo_event_set = emo_set | event_set
+
+# 中文/英文/数字检测正则（模块加载时预编译，避免热路径上重复查找缓存）
+_chinese_english_number_re = re.compile(r'[\u4e00-\u9fffA-Za-z0-9]')
 
 
 def format_str(s: str) -> str:
@@ -48,10 +52,11 @@ def format_str(s: str) -> str:
 
 def format_str_v2(s: str) -> str:
     """增强版文本格式化"""
-    sptk_dict = {}
-    for sptk in emoji_dict:
-        sptk_dict[sptk] = s.count(sptk)
-        s = s.replace(sptk, "")
+    sptk_dict = dict.fromkeys(emoji_dict, 0)
+    if "<|" in s:  # 不含特殊标记时计数全为0，跳过逐个标记的计数和替换
+        for sptk in emoji_dict:
+            sptk_dict[sptk] = s.count(sptk)
+            s = s.replace(sptk, "")
     
     emo = "<|NEUTRAL|>"
     for e in emo_dict:
@@ -64,7 +69,7 @@ def format_str_v2(s: str) -> str:
     
     s = s + emo_dict[emo]
     
-    for emoji in emo_set.union(event_set):
+    for emoji in _emo_event_set:
         s = s.replace(" " + emoji, emoji)
         s = s.replace(emoji + " ", emoji)
     
@@ -79,10 +84,11 @@ def format_str_v3(s: str) -> str:
     def get_event(s):
         return s[0] if s[0] in event_set else None
     
-    s = s.replace("<|nospeech|><|Event_UNK|>", "❓")
-    
-    for lang in lang_dict:
-        s = s.replace(lang, "<|lang|>")
+    if "<|" in s:
+        s = s.replace("<|nospeech|><|Event_UNK|>", "❓")
+        
+        for lang in lang_dict:
+            s = s.replace(lang, "<|lang|>")
     
     s_list = [format_str_v2(s_i).strip(" ") for s_i in s.split("<|lang|>")]
     new_s = " " + s_list[0]
@@ -104,4 +110,4 @@ def format_str_v3(s: str) -> str:
 
 def contains_chinese_english_number(s: str) -> bool:
     """检查字符串是否包含中文、英文或数字"""
-    return bool(re.search(r'[\u4e00-\u9fffA-Za-z0-9]', s)) 
\ No newline at end of file
+    return _chinese_english_number_re.search(s) is not None